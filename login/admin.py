@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Profile, Activity
+from .models import Profile, Activity, Job
 
 
 class ProfileInline(admin.StackedInline):
@@ -22,3 +22,11 @@ class UserAdmin(BaseUserAdmin):
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 admin.site.register(Activity)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'args', 'status', 'attempts', 'run_at', 'worker')
+    list_filter = ('status', 'task')
+
+
+admin.site.register(Job, JobAdmin)
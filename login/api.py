@@ -0,0 +1,153 @@
+"""JSON API for activities and profile of the logged in user.
+
+Responses of GET requests carry an ETag and Last-Modified made from the version of profile's data, so clients
+asking again with If-None-Match or If-Modified-Since get 304 without the activities being read. The version is
+stored with the profile, so every process gives the same ETag.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_http_methods
+
+from .cache import get_last_modified, get_version
+from .forms import ActivityForm, NameForm, form_value
+from .models import Activity, ProfileStats
+from .views import parse_cursor
+from . import recompute
+
+
+def api_login_required(view):
+
+    """Decorator returning 401 instead of redirecting when the user is not logged in or has no profile."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated or not hasattr(request.user, 'profile'):
+            return JsonResponse({'error': "Authentication required."}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def profile_etag(request, *args, **kwargs):
+    version = get_version(request.user.profile)
+    return hashlib.md5(('%s %s' % (version, request.get_full_path())).encode()).hexdigest()
+
+
+def profile_last_modified(request, *args, **kwargs):
+    return get_last_modified(request.user.profile)
+
+
+conditional = condition(etag_func=profile_etag, last_modified_func=profile_last_modified)
+
+
+def activity_to_dict(activity):
+    return {'id': activity.id, 'date': activity.date.isoformat(), 'duration': activity.duration,
+            'distance': activity.distance, 'comment': activity.comment, 'calories': activity.calories,
+            'tempo': activity.tempo}
+
+
+def profile_to_dict(profile):
+    return {'weight': profile.weight, 'height': profile.height, 'age': profile.age, 'gender': profile.gender}
+
+
+def read_form(request, form_class, initial):
+
+    """Returns a form bound to JSON body of the request; fields missing from the body keep their initial values.
+
+    Values which aren't text are bound as their JSON, so the form rejects them instead of failing on them.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+    return form_class(data=dict(initial, **{name: form_value(value) for name, value in data.items()}))
+
+
+def errors_response(form):
+    return JsonResponse({'errors': form.errors}, status=400)
+
+
+@api_login_required
+@conditional
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def activities_api(request):
+
+    """Lists all activities, planned ones too, newest first (?after=<cursor> gives the next page) or creates one."""
+    profile = request.user.profile
+    if request.method == 'POST':
+        form = read_form(request, ActivityForm, {})
+        if not form.is_valid():
+            return errors_response(form)
+        activity = Activity(profile=profile, **form.cleaned_data)
+        with transaction.atomic():
+            activity.save()
+            ProfileStats.record(activity)
+        return JsonResponse(activity_to_dict(activity), status=201)
+    activities = Activity.objects.filter(profile=profile).order_by('-date', 'id')
+    cursor = parse_cursor(request.GET.get('after', ''))
+    if cursor:
+        activities = activities.filter(Q(date__lt=cursor[0]) | Q(id__gt=cursor[1]), date__lte=cursor[0])
+    page_size = settings.HISTORY_PAGE_SIZE
+    page = list(activities[:page_size + 1])
+    data = {'activities': [activity_to_dict(activity) for activity in page[:page_size]],
+            'next': None}
+    if len(page) > page_size:
+        last = page[page_size - 1]
+        data['next'] = '%s_%d' % (last.date.isoformat(), last.id)
+    return JsonResponse(data)
+
+
+@api_login_required
+@conditional
+@require_http_methods(['GET', 'HEAD', 'PUT', 'PATCH', 'DELETE'])
+def activity_api(request, activity_id):
+
+    """Shows, updates or deletes one activity of the user."""
+    activity = get_object_or_404(Activity.objects.select_related('profile'), pk=activity_id,
+                                 profile__user=request.user)
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            activity.delete()
+            ProfileStats.record(activity, -1)
+        return HttpResponse(status=204)
+    if request.method in ('PUT', 'PATCH'):
+        initial = {'date': activity.date, 'duration': activity.duration, 'distance': activity.distance,
+                   'comment': activity.comment} if request.method == 'PATCH' else {}
+        form = read_form(request, ActivityForm, initial)
+        if not form.is_valid():
+            return errors_response(form)
+        with transaction.atomic():
+            ProfileStats.record(activity, -1)
+            for field, value in form.cleaned_data.items():
+                setattr(activity, field, value)
+            activity.save()
+            ProfileStats.record(activity)
+    return JsonResponse(activity_to_dict(activity))
+
+
+@api_login_required
+@conditional
+@require_http_methods(['GET', 'HEAD', 'PUT', 'PATCH'])
+def profile_api(request):
+
+    """Shows or updates profile of the user."""
+    profile = request.user.profile
+    if request.method in ('PUT', 'PATCH'):
+        form = read_form(request, NameForm, profile_to_dict(profile) if request.method == 'PATCH' else {})
+        if not form.is_valid():
+            return errors_response(form)
+        weight_changed = profile.weight != form.cleaned_data['weight']
+        for field, value in form.cleaned_data.items():
+            setattr(profile, field, value)
+        with transaction.atomic():
+            profile.save()
+            if weight_changed:
+                recompute.weight_changed(profile)
+    return JsonResponse(profile_to_dict(profile))
@@ -0,0 +1,51 @@
+"""Bundles of vendored and own static files, so that every page loads one stylesheet and one script.
+
+Bundles are written into login/static by the bundle_assets command and committed. collectstatic then
+fingerprints and compresses them like every other static file.
+"""
+import os
+import re
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+BUNDLES = {
+    'bundle.css': ['vendor/bootstrap/bootstrap.min.css', 'style.css'],
+    'bundle.js': ['vendor/jquery/jquery.slim.min.js', 'vendor/bootstrap/bootstrap.bundle.min.js'],
+}
+# Source maps are not vendored, browsers would request them in vain.
+SOURCE_MAP = re.compile(r'^(/\*# sourceMappingURL=.*\*/|//# sourceMappingURL=.*)\n?', re.MULTILINE)
+
+
+def build(name):
+
+    """Returns content of a bundle, its files joined in order without their source map comments."""
+    parts = []
+    for path in BUNDLES[name]:
+        with open(os.path.join(STATIC_DIR, path), encoding='utf-8') as file:
+            parts.append(SOURCE_MAP.sub('', file.read()).strip())
+    separator = '\n;\n' if name.endswith('.js') else '\n'
+    return separator.join(parts) + '\n'
+
+
+def outdated():
+
+    """Returns names of bundles whose files differ from what build() gives."""
+    names = []
+    for name in BUNDLES:
+        path = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(path):
+            names.append(name)
+            continue
+        with open(path, encoding='utf-8') as file:
+            if file.read() != build(name):
+                names.append(name)
+    return names
+
+
+def write_bundles():
+
+    """Writes every outdated bundle and returns their names."""
+    names = outdated()
+    for name in names:
+        with open(os.path.join(STATIC_DIR, name), 'w', encoding='utf-8') as file:
+            file.write(build(name))
+    return names
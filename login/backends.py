@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+
+
+class ProfileBackend(ModelBackend):
+
+    """Authentication backend loading user of a session together with their profile, in one query instead of two.
+
+    Sessions are checked by Django's authentication middleware like with ModelBackend. With SELECT_RELATED_PROFILE
+    turned off it loads just the user, as ModelBackend does, and sessions stay valid either way.
+    """
+
+    def get_user(self, user_id):
+        if not settings.SELECT_RELATED_PROFILE:
+            return super().get_user(user_id)
+        try:
+            user = User._default_manager.select_related('profile').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,53 @@
+"""Running work, like queued jobs, in background threads of the web process."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_for_futures
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_futures = set()
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_THREADS,
+                                           thread_name_prefix='background')
+        return _executor
+
+
+def call(func, *args):
+
+    """Calls func, logging its errors and closing database connections of the thread afterwards."""
+    try:
+        return func(*args)
+    except Exception:
+        logger.exception("Background call of %s failed.", func.__name__)
+    finally:
+        connections.close_all()
+
+
+def submit(func, *args):
+
+    """Calls func in a background thread, or right away when BACKGROUND_THREADS is 0."""
+    if not settings.BACKGROUND_THREADS:
+        func(*args)
+        return
+    future = get_executor().submit(call, func, *args)
+    with _lock:
+        _futures.add(future)
+    future.add_done_callback(lambda done: _futures.discard(done))
+
+
+def wait():
+
+    """Waits until all background calls submitted so far are done."""
+    with _lock:
+        futures = list(_futures)
+    wait_for_futures(futures)
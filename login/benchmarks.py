@@ -0,0 +1,523 @@
+"""Benchmarks run by the benchmark command on a temporary test database."""
+import datetime
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.db.utils import load_backend
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .cache import get_cache
+from .charts import render_charts
+from .db import apply_pragmas
+from .metrics import add_metrics
+from .monitoring import QueryTimer
+from .models import Profile, Activity, User
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+
+    """Registers a benchmark under the name of the function."""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def create_runner(username, activities, per_day=3, start=None):
+
+    """Creates a logged in client of a user with given number of past activities, per_day of them each day."""
+    user = User.objects.create_user(username, password='bar')
+    profile = Profile.objects.create(user=user, weight=70, height=180, age=30, gender='Female')
+    start = start or datetime.date.today() - datetime.timedelta(days=1)
+    batch = []
+    for i in range(activities):
+        batch.append(Activity(profile=profile, date=start - datetime.timedelta(days=i // per_day),
+                              duration=20 + i % 60, distance=3 + i % 17, comment='Run %d' % i))
+        if len(batch) == 5000:
+            Activity.objects.bulk_create(add_metrics(batch, profile.weight))
+            batch = []
+    Activity.objects.bulk_create(add_metrics(batch, profile.weight))
+    client = Client()
+    client.login(username=username, password='bar')
+    return client, profile
+
+
+def time_call(func, repeat):
+
+    """Returns median time of calling a function in milliseconds."""
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def time_get(client, url, repeat, cached=True):
+
+    """Returns median time of getting an url in milliseconds, by default leaving pages in the cache."""
+    def get():
+        if not cached:
+            get_cache().clear()
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+    return time_call(get, repeat)
+
+
+@benchmark
+def history_pages(stdout, activities=100000, repeat=5):
+
+    """Compares latency of deep history pages picked by number and by cursor."""
+    client, profile = create_runner('history', activities)
+    url = reverse('view_history')
+    page_size = 50
+    ordered = Activity.objects.filter(profile=profile).order_by('-date', 'id').values_list('date', 'id')
+    stdout.write('%10s %12s %12s' % ('page', 'offset ms', 'cursor ms'))
+    for page in (1, 10, 100, 1000, activities // page_size):
+        offset = time_get(client, '%s?page=%d' % (url, page), repeat)
+        if page == 1:
+            cursor_url = url
+        else:
+            date, activity_id = ordered[(page - 1) * page_size - 1]
+            cursor_url = '%s?after=%s_%d' % (url, date.isoformat(), activity_id)
+        cursor = time_get(client, cursor_url, repeat)
+        stdout.write('%10d %12.2f %12.2f' % (page, offset, cursor))
+
+
+@benchmark
+def export_memory(stdout, repeat=1):
+
+    """Measures peak memory of streaming exports of growing histories."""
+    stdout.write('%10s %8s %12s %12s' % ('activities', 'format', 'peak KiB', 'time ms'))
+    for activities in (1000, 10000, 100000):
+        client, profile = create_runner('export%d' % activities, activities)
+        for file_format in ('csv', 'ndjson'):
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = client.get(reverse('export'), {'format': file_format})
+            for line in response.streaming_content:
+                pass
+            elapsed = (time.perf_counter() - start) * 1000
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+            stdout.write('%10d %8s %12.0f %12.0f' % (activities, file_format, peak, elapsed))
+
+
+@benchmark
+def stats_buckets(stdout, repeat=5):
+
+    """Compares grouped bucket queries with grouping in Python on ten years of daily runs."""
+    client, profile = create_runner('buckets', 3650, per_day=1)
+    activities = Activity.objects.filter(profile=profile)
+    starts = {'week': lambda date: date - datetime.timedelta(days=date.weekday()),
+              'month': lambda date: date.replace(day=1), 'year': lambda date: date.replace(month=1, day=1)}
+    stdout.write('%8s %8s %12s %12s %12s' % ('period', 'buckets', 'query ms', 'python ms', 'json ms'))
+    for period, start_of in starts.items():
+        query = time_call(lambda: activities.buckets(period), repeat)
+        python = time_call(lambda: group_in_python(activities, start_of), repeat)
+        json = time_get(client, '%s?period=%s' % (reverse('stats_json'), period), repeat, cached=False)
+        count = len(activities.buckets(period))
+        stdout.write('%8s %8d %12.2f %12.2f %12.2f' % (period, count, query, python, json))
+
+
+@benchmark
+def stats_charts(stdout, repeat=5):
+
+    """Measures drawing of charts of ten years of daily runs and the stats page with them, which should take ms."""
+    client, profile = create_runner('charts', 3650, per_day=1)
+    activities = Activity.objects.filter(profile=profile)
+    stdout.write('%8s %8s %12s %12s %12s' % ('period', 'buckets', 'charts ms', 'SVG KiB', 'page ms'))
+    for period in ('week', 'month', 'year'):
+        buckets = activities.buckets(period)
+        charts = time_call(lambda: render_charts(buckets, period), repeat)
+        size = sum(map(len, render_charts(buckets, period).values())) / 1024
+        page = time_get(client, '%s?period=%s' % (reverse('stats'), period), repeat, cached=False)
+        stdout.write('%8s %8d %12.2f %12.1f %12.2f' % (period, len(buckets), charts, size, page))
+
+
+def group_in_python(activities, start_of):
+
+    """Groups activities by period in a Python loop, the way it would be done without grouped queries."""
+    buckets = {}
+    for activity in activities:
+        bucket = buckets.setdefault(start_of(activity.date), [0, 0, 0, 0])
+        bucket[0] += 1
+        bucket[1] += activity.calories
+        bucket[2] += activity.distance
+        bucket[3] += activity.duration
+    return buckets
+
+
+@benchmark
+def api_throughput(stdout, repeat=5, requests=200):
+
+    """Compares requests per second of HTML views and the JSON API, with and without conditional GET."""
+    client, profile = create_runner('api', 10000)
+    activity = Activity.objects.filter(profile=profile).first()
+    cases = [('history html', reverse('view_history'), False, False),
+             ('history html cached', reverse('view_history'), True, False),
+             ('activities api', reverse('api_activities'), False, False),
+             ('activities api 304', reverse('api_activities'), True, True),
+             ('detail html', reverse('detail', args=[activity.id]), False, False),
+             ('activity api', reverse('api_activity', args=[activity.id]), False, False)]
+    stdout.write('%22s %12s' % ('case', 'requests/s'))
+    for name, url, cached, conditional in cases:
+        headers = {'HTTP_IF_NONE_MATCH': client.get(url)['ETag']} if conditional else {}
+
+        def get_all():
+            for i in range(requests):
+                if not cached:
+                    get_cache().clear()
+                response = client.get(url, **headers)
+                assert response.status_code in (200, 304), response.status_code
+        stdout.write('%22s %12.0f' % (name, requests / time_call(get_all, repeat) * 1000))
+
+
+CONTENTION_SCHEMA = [
+    'CREATE TABLE activity (id INTEGER PRIMARY KEY, profile_id INTEGER, date TEXT, duration INTEGER, '
+    'distance REAL, comment TEXT)',
+    'CREATE INDEX activity_profile_date ON activity (profile_id, date DESC, id)',
+    'CREATE TABLE stats (profile_id INTEGER PRIMARY KEY, count INTEGER, distance REAL)',
+]
+
+
+def contention_worker(path, pragmas, role, seconds, results):
+
+    """Writes activities like add_activity or reads pages like history_view until time runs out."""
+    connection = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(connection.cursor(), pragmas)
+    done = errors = 0
+    latencies = []
+    end = time.perf_counter() + seconds
+    rng = random.Random()
+    while time.perf_counter() < end:
+        profile_id = rng.randint(1, 10)
+        start = time.perf_counter()
+        try:
+            if role == 'writer':
+                connection.execute('BEGIN')
+                connection.execute('INSERT INTO activity (profile_id, date, duration, distance, comment) '
+                                   "VALUES (?, date('now', ?), 30, 5, 'Run')",
+                                   (profile_id, '-%d days' % rng.randint(0, 3000)))
+                connection.execute('UPDATE stats SET count = count + 1, distance = distance + 5 WHERE profile_id = ?',
+                                   (profile_id,))
+                connection.execute('COMMIT')
+            else:
+                connection.execute('SELECT * FROM activity WHERE profile_id = ? ORDER BY date DESC, id LIMIT 50',
+                                   (profile_id,)).fetchall()
+                connection.execute('SELECT count, distance FROM stats WHERE profile_id = ?', (profile_id,)).fetchall()
+            done += 1
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+    results.put((role, done, errors, max(latencies, default=0)))
+
+
+@benchmark
+def sqlite_contention(stdout, repeat=1, writers=4, readers=4, seconds=3):
+
+    """Compares concurrent writes and reads of several processes without and with SQLITE_PRAGMAS."""
+    stdout.write('%10s %10s %10s %10s %10s %14s' % ('pragmas', 'writes/s', 'w errors', 'reads/s', 'r errors',
+                                                     'max write ms'))
+    for name, pragmas in (('none', {}), ('settings', settings.SQLITE_PRAGMAS)):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'contention.sqlite3')
+            connection = sqlite3.connect(path)
+            for statement in CONTENTION_SCHEMA:
+                connection.execute(statement)
+            connection.executemany('INSERT INTO stats VALUES (?, 0, 0)', [(i,) for i in range(1, 11)])
+            connection.commit()
+            connection.close()
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            processes = [context.Process(target=contention_worker, args=(path, pragmas, role, seconds, results))
+                         for role in ['writer'] * writers + ['reader'] * readers]
+            for process in processes:
+                process.start()
+            totals = {'writer': [0, 0, 0], 'reader': [0, 0, 0]}
+            for process in processes:
+                role, done, errors, slowest = results.get()
+                totals[role][0] += done
+                totals[role][1] += errors
+                totals[role][2] = max(totals[role][2], slowest)
+            for process in processes:
+                process.join()
+        stdout.write('%10s %10.0f %10d %10.0f %10d %14.1f' % (
+            name, totals['writer'][0] / seconds, totals['writer'][1], totals['reader'][0] / seconds,
+            totals['reader'][1], totals['writer'][2] * 1000))
+
+
+def simulate_requests(wrapper, requests, persistent, health_check):
+
+    """Runs one query per simulated request, closing the connection after each request unless it is persistent."""
+    for i in range(requests):
+        if health_check and wrapper.connection is not None and not wrapper.is_usable():
+            wrapper.close()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not persistent:
+            wrapper.close()
+    wrapper.close()
+
+
+@benchmark
+def connection_overhead(stdout, repeat=5, requests=500):
+
+    """Compares time per request of opening a connection every request and of persistent connections."""
+    default = connections['default']
+    settings_dict = dict(default.settings_dict)
+    with tempfile.TemporaryDirectory() as directory:
+        if default.vendor == 'sqlite':
+            # The test database lives in memory, which can't be reopened, so a file stands in for it.
+            settings_dict['NAME'] = os.path.join(directory, 'overhead.sqlite3')
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'overhead')
+        stdout.write('%24s %14s' % ('connections', 'ms/request'))
+        for name, persistent, health_check in (('per request', False, False), ('persistent', True, False),
+                                               ('persistent + checks', True, True)):
+            elapsed = time_call(lambda: simulate_requests(wrapper, requests, persistent, health_check), repeat)
+            stdout.write('%24s %14.3f' % (name, elapsed / requests))
+
+
+@benchmark
+def monitoring_overhead(stdout, repeat=500):
+
+    """Compares latency of a cached page with measuring requests turned off and on."""
+    create_runner('monitoring', 100)
+    url = reverse('view_history')
+    stdout.write('%12s %12s' % ('sample rate', 'ms'))
+    for rate in (0, 1):
+        with override_settings(MONITORING_SAMPLE_RATE=rate):
+            client = Client()
+            client.login(username='monitoring', password='bar')
+            time_get(client, url, repeat)
+            stdout.write('%12s %12.3f' % (rate, time_get(client, url, repeat)))
+
+
+def new_activity(profile):
+    return Activity.objects.create(profile=profile, date=datetime.date.today(), duration=30, distance=5,
+                                   comment='Benchmark')
+
+
+def activity_data(profile, i):
+    return {'date': datetime.date.today().isoformat(), 'duration': 30 + i % 10, 'distance': 5, 'comment': 'Run'}
+
+
+def profile_data(profile, i):
+    return {'weight': 70 + i % 2, 'height': 180, 'age': 30, 'gender': 'Female'}
+
+
+def import_data(profile, i):
+    rows = ''.join('2020-01-%02d,30,5,Imported\n' % day for day in range(1, 11))
+    return {'file': SimpleUploadedFile('runs.csv', ('date,duration,distance,comment\n' + rows).encode())}
+
+
+# Name, method, url and data (or None) of requests to every view. Urls and data are made for a profile and
+# the number of the request, before the request is timed.
+VIEW_CASES = [
+    ('home', 'get', lambda profile: reverse('home'), None),
+    ('signup', 'get', lambda profile: reverse('signup'), None),
+    ('form', 'get', lambda profile: '/form/', None),
+    ('data', 'get', lambda profile: reverse('data_page'), None),
+    ('update', 'get', lambda profile: reverse('update'), None),
+    ('update post', 'post', lambda profile: reverse('update'), profile_data),
+    ('add activity', 'get', lambda profile: reverse('add_activity'), None),
+    ('add activity post', 'post', lambda profile: reverse('add_activity'), activity_data),
+    ('history', 'get', lambda profile: reverse('view_history'), None),
+    ('history last page', 'get', lambda profile: reverse('view_history') + '?page=1000000', None),
+    ('detail', 'get', lambda profile: reverse('detail', args=[new_activity(profile).id]), None),
+    ('edit', 'get', lambda profile: reverse('edit', args=[new_activity(profile).id]), None),
+    ('edit post', 'post', lambda profile: reverse('edit', args=[new_activity(profile).id]), activity_data),
+    ('remove', 'get', lambda profile: reverse('remove', args=[new_activity(profile).id]), None),
+    ('stats', 'get', lambda profile: reverse('stats'), None),
+    ('stats json', 'get', lambda profile: reverse('stats_json') + '?period=week', None),
+    ('import', 'get', lambda profile: reverse('import'), None),
+    ('import post', 'post', lambda profile: reverse('import'), import_data),
+    ('export csv', 'get', lambda profile: reverse('export') + '?format=csv', None),
+    ('cache stats', 'get', lambda profile: reverse('cache_stats'), None),
+    ('monitoring', 'get', lambda profile: reverse('monitoring'), None),
+]
+
+# Limits checked by the views benchmark. Query counts must not exceed given numbers for any number of
+# activities. Times (median milliseconds) and allocations (peak KiB) are checked at the largest size, with
+# about twice the time measured on a development machine, so only real regressions exceed them.
+VIEW_LIMITS = {
+    'queries': {'home': 2, 'signup': 2, 'form': 2, 'data': 2, 'update': 2, 'update post': 5, 'add activity': 2,
+                'add activity post': 6, 'history': 3, 'history last page': 4, 'detail': 3, 'edit': 3,
+                'edit post': 9, 'remove': 7, 'stats': 4, 'stats json': 3, 'import': 2, 'import post': 11,
+                'export csv': 3, 'cache stats': 2, 'monitoring': 2},
+    'ms': {'history': 50, 'history last page': 75, 'detail': 25, 'add activity post': 25, 'edit post': 30,
+           'remove': 30, 'update post': 25, 'import post': 150, 'stats': 600, 'stats json': 600,
+           'export csv': 3000},
+    'kib': {'history': 1024, 'stats': 4096, 'stats json': 12288, 'export csv': 4096},
+}
+
+
+def prepare(client, case, profile, i):
+
+    """Makes url and data of the i-th request of a case and returns a function sending it without the page cache."""
+    name, method, url, data = case
+    url = url(profile)
+    data = data(profile, i) if data else None
+    get_cache().clear()
+
+    def send():
+        response = getattr(client, method)(url, data) if data else getattr(client, method)(url)
+        assert response.status_code in (200, 302), '%s: %d' % (name, response.status_code)
+        if response.streaming:
+            for chunk in response.streaming_content:
+                pass
+    return send
+
+
+def measure_view(client, case, profile, repeat):
+
+    """Returns median time, number of queries and peak allocations of requests of a case."""
+    timings = []
+    for i in range(repeat):
+        send = prepare(client, case, profile, i)
+        start = time.perf_counter()
+        send()
+        timings.append((time.perf_counter() - start) * 1000)
+    timer = QueryTimer()
+    send = prepare(client, case, profile, repeat)
+    with connection.execute_wrapper(timer):
+        send()
+    send = prepare(client, case, profile, repeat + 1)
+    tracemalloc.start()
+    send()
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return {'view': case[0], 'ms': round(statistics.median(timings), 3), 'queries': timer.queries,
+            'kib': round(peak, 1)}
+
+
+def with_defaults(defaults, limits):
+
+    """Returns default limits replaced by given ones. Limits of views can be given for some of the views only."""
+    merged = dict(defaults)
+    for key, value in (limits or {}).items():
+        merged[key] = dict(defaults.get(key, {}), **value) if isinstance(value, dict) else value
+    return merged
+
+
+def check_limits(results, limits):
+
+    """Returns descriptions of results exceeding limits, and of views whose query count grows with activities."""
+    failures = []
+    largest = max(result['activities'] for result in results)
+    queries = {}
+    for result in results:
+        view = result['view']
+        queries.setdefault(view, set()).add(result['queries'])
+        if result['queries'] > limits['queries'].get(view, float('inf')):
+            failures.append('%s made %d queries with %d activities, limit is %d.' % (
+                view, result['queries'], result['activities'], limits['queries'][view]))
+        if result['activities'] != largest:
+            continue
+        for measure, unit in (('ms', 'ms'), ('kib', 'KiB')):
+            if result[measure] > limits[measure].get(view, float('inf')):
+                failures.append('%s took %s %s with %d activities, limit is %s.' % (
+                    view, result[measure], unit, largest, limits[measure][view]))
+    for view, counts in queries.items():
+        if len(counts) > 1:
+            failures.append('%s made different numbers of queries for different numbers of activities: %s.' % (
+                view, ', '.join(map(str, sorted(counts)))))
+    return failures
+
+
+@benchmark
+def views(stdout, repeat=5, sizes=(0, 100, 10000, 100000), limits=None):
+
+    """Measures time, queries and allocations of every view for profiles with growing numbers of activities.
+
+    Jobs queued by requests are not run, as in a deployment where the worker command runs them.
+    """
+    results = []
+    stdout.write('%10s %20s %10s %8s %10s' % ('activities', 'view', 'ms', 'queries', 'peak KiB'))
+    with override_settings(BACKGROUND_THREADS=0):
+        for size in sizes:
+            client, profile = create_runner('views%d' % size, size)
+            User.objects.filter(profile=profile).update(is_staff=True)
+            for case in VIEW_CASES:
+                result = dict(measure_view(client, case, profile, repeat), activities=size)
+                results.append(result)
+                stdout.write('%10d %20s %10.2f %8d %10.0f' % (size, result['view'], result['ms'],
+                                                            result['queries'], result['kib']))
+    failures = check_limits(results, with_defaults(VIEW_LIMITS, limits))
+    for failure in failures:
+        stdout.write(failure)
+    return {'results': results, 'failures': failures}
+
+
+PAGE_WEIGHT_CASES = [('home', '/', False), ('login', '/accounts/login/', False), ('signup', '/signup/', False),
+                     ('history', '/view_history/', True), ('stats', '/stats/', True),
+                     ('add activity', '/new_activity/', True), ('data', '/data/', True)]
+PAGE_WEIGHT_LIMITS = {'requests': 3, 'external': 0, 'kib': 80, 'repeat kib': 16}
+ASSET_URL = re.compile(r'<(?:link|script|img)\b[^>]*?\b(?:href|src)=["\']([^"\']+)["\']')
+
+
+def response_size(response):
+    return len(b''.join(response.streaming_content) if response.streaming else response.content)
+
+
+def weigh_page(client, path):
+
+    """Returns number of requests, external requests and transferred KiB of a page with its assets.
+
+    Assets are requested like a browser accepting brotli would. 'repeat kib' leaves out assets which browsers keep
+    cached as immutable, so it is what a page weighs for a returning visitor.
+    """
+    response = client.get(path)
+    html = response.content
+    urls = ASSET_URL.findall(html.decode())
+    external = [url for url in urls if re.match(r'(https?:)?//', url)]
+    assets = cached = 0
+    for url in urls:
+        if url in external:
+            continue
+        asset = client.get(url, HTTP_ACCEPT_ENCODING='br, gzip')
+        size = response_size(asset)
+        assets += size
+        if asset.status_code == 200 and 'immutable' in asset.get('Cache-Control', ''):
+            cached += size
+    return {'requests': 1 + len(urls), 'external': len(external), 'kib': round((len(html) + assets) / 1024, 1),
+            'repeat kib': round((len(html) + assets - cached) / 1024, 1)}
+
+
+@benchmark
+def page_weight(stdout, repeat=1, limits=None):
+
+    """Measures requests and transferred bytes of pages with their stylesheets, scripts and images.
+
+    Static files are served from STATIC_ROOT, so collectstatic has to be run first. External requests can't be
+    weighed offline, they are only counted.
+    """
+    limits = with_defaults(PAGE_WEIGHT_LIMITS, limits)
+    client, profile = create_runner('pages', 100)
+    results = []
+    failures = []
+    stdout.write('%15s %8s %8s %8s %10s' % ('page', 'requests', 'external', 'KiB', 'repeat KiB'))
+    for name, path, logged_in in PAGE_WEIGHT_CASES:
+        result = dict(weigh_page(client if logged_in else Client(), path), page=name)
+        results.append(result)
+        stdout.write('%15s %8d %8d %8.1f %10.1f' % (name, result['requests'], result['external'], result['kib'],
+                                                    result['repeat kib']))
+        for measure in ('requests', 'external', 'kib', 'repeat kib'):
+            if result[measure] > limits[measure]:
+                failures.append('%s has %s %s, limit is %s.' % (name, result[measure], measure, limits[measure]))
+    for failure in failures:
+        stdout.write(failure)
+    return {'results': results, 'failures': failures}
@@ -0,0 +1,97 @@
+"""Caching pages per profile. Every write to profile's data changes its version, so older pages are not served."""
+import datetime
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.utils import timezone
+
+from .models import Profile, new_version
+from .routers import mark_written
+
+HITS_KEY = 'page-cache:hits'
+MISSES_KEY = 'page-cache:misses'
+
+
+def get_cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def get_version(profile):
+
+    """Returns version of profile's data in the database the request reads from.
+
+    A replica may lag behind the primary the profile was loaded from, and pages rendered from it have to be
+    cached under the version it has. Returns None when the profile hasn't reached the replica yet.
+    """
+    database = router.db_for_read(Profile, instance=profile)
+    if database == profile._state.db:
+        return profile.version
+    return Profile.objects.using(database).filter(pk=profile.pk).values_list('version', flat=True).first()
+
+
+def get_last_modified(profile):
+
+    """Returns time of the last change of profile's data."""
+    milliseconds = int(get_version(profile).split('-')[0])
+    return datetime.datetime.fromtimestamp(milliseconds / 1000, datetime.timezone.utc)
+
+
+def bump_version(profile_id):
+
+    """Starts a new version of profile's data.
+
+    The version is stored with the profile, so it commits together with the changed data and every process
+    sharing the database stops serving older pages, whichever cache they use. The client making the change
+    is pinned to the primary, so it doesn't read older data from a replica.
+    """
+    Profile.objects.filter(pk=profile_id).update(version=new_version())
+    mark_written()
+
+
+def count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def page_cache_stats():
+
+    """Returns number of pages served from the cache and rendered again."""
+    cache = get_cache()
+    return {'hits': cache.get(HITS_KEY, 0), 'misses': cache.get(MISSES_KEY, 0)}
+
+
+def cache_per_profile(view):
+
+    """Decorator caching successful GET responses of a view for the logged in profile until its data changes.
+
+    Date is a part of the key, because activities dated in the future are shown when their day comes.
+    Put it below read_from_replica, so the version is read from the database the page is rendered from.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or not request.user.is_authenticated or not hasattr(request.user, 'profile'):
+            return view(request, *args, **kwargs)
+        profile = request.user.profile
+        version = get_version(profile)
+        if version is None:
+            return view(request, *args, **kwargs)
+        key = 'page:%s:%d:%s:%s:%s' % (view.__name__, profile.id, version,
+                                       timezone.localdate().isoformat(),
+                                       hashlib.md5(request.get_full_path().encode()).hexdigest())
+        cache = get_cache()
+        response = cache.get(key)
+        if response is not None:
+            count(HITS_KEY)
+            return response
+        count(MISSES_KEY)
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
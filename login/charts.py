@@ -0,0 +1,113 @@
+"""Charts of statistics drawn on the server as SVG, so the stats page needs no charting scripts."""
+import datetime
+import math
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+WIDTH = 800
+HEIGHT = 260
+LEFT, RIGHT, TOP, BOTTOM = 56, 12, 16, 28
+COLOR = '#17a2b8'
+PERIOD_DAYS = {'week': 7, 'month': 30.44, 'year': 365.25}
+# Number of periods averaged by the trend line of tempo.
+TREND_WINDOW = {'week': 8, 'month': 3, 'year': 1}
+
+
+def nice_step(span, ticks=4):
+
+    """Returns step of about ticks ticks covering span, 1, 2 or 5 times a power of ten."""
+    rough = span / ticks if span > 0 else 1
+    power = 10 ** math.floor(math.log10(rough))
+    return next(step * power for step in (1, 2, 5, 10) if step * power >= rough)
+
+
+class Frame:
+
+    """Maps dates and values to coordinates of the plotting area and draws grid and labels around it."""
+
+    def __init__(self, first, last, low, high, period):
+        self.first = first
+        self.days = (last - first).days + PERIOD_DAYS[period]
+        self.step = nice_step(high - low)
+        self.low = math.floor(low / self.step) * self.step
+        self.high = max(math.ceil(high / self.step) * self.step, self.low + self.step)
+        self.period = period
+
+    def x(self, date):
+        return LEFT + (date - self.first).days / self.days * (WIDTH - LEFT - RIGHT)
+
+    def y(self, value):
+        return HEIGHT - BOTTOM - (value - self.low) / (self.high - self.low) * (HEIGHT - TOP - BOTTOM)
+
+    def grid(self, unit):
+        lines = []
+        labels = []
+        ticks = round((self.high - self.low) / self.step)
+        for i in range(ticks + 1):
+            value = self.low + i * self.step
+            y = self.y(value)
+            lines.append('M%d %.1fH%d' % (LEFT, y, WIDTH - RIGHT))
+            labels.append('<text x="%d" y="%.1f" text-anchor="end">%s</text>' % (
+                LEFT - 6, y + 4, escape('%g %s' % (round(value, 6), unit))))
+        return '<path d="%s" stroke="#dee2e6"/>%s%s' % (''.join(lines), ''.join(labels), self.dates())
+
+    def dates(self):
+        """Returns labels of at most 8 evenly spread dates, years for long spans."""
+        years = self.days > 3 * 365 or self.period == 'year'
+        step = max(1, math.ceil(self.days / 8 / (365.25 if years else 30.44)))
+        date = datetime.date(self.first.year, 1 if years else self.first.month, 1)
+        last = self.first + datetime.timedelta(days=self.days)
+        labels = []
+        while date < last:
+            if date >= self.first:
+                labels.append('<text x="%.1f" y="%d" text-anchor="middle">%s</text>' % (
+                    self.x(date), HEIGHT - 8, date.year if years else date.strftime('%b %Y')))
+            if years:
+                date = date.replace(year=date.year + step)
+            else:
+                month = date.month - 1 + step
+                date = date.replace(year=date.year + month // 12, month=month % 12 + 1)
+        return ''.join(labels)
+
+
+def svg(title, body):
+    return ('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 %d %d" width="100%%" role="img" '
+            'font-family="sans-serif" font-size="12" fill="#495057"><title>%s</title>%s</svg>'
+            % (WIDTH, HEIGHT, escape(title), body))
+
+
+def distance_chart(buckets, period):
+
+    """Returns SVG with a bar of distance for every period with activities, drawn as one path."""
+    frame = Frame(buckets[0]['start'], buckets[-1]['start'], 0, max(bucket['distance'] for bucket in buckets), period)
+    width = max(1, frame.x(frame.first + datetime.timedelta(days=PERIOD_DAYS[period])) - LEFT - 1)
+    bars = ''.join('M%.1f %.1fh%.1fV%dh%.1fz' % (frame.x(bucket['start']), frame.y(bucket['distance']), width,
+                                                  HEIGHT - BOTTOM, -width) for bucket in buckets)
+    return svg('Distance by %s' % period, '%s<path d="%s" fill="%s"/>' % (frame.grid('km'), bars, COLOR))
+
+
+def pace_chart(buckets, period):
+
+    """Returns SVG with average tempo of every period and its trend, the mean of the last few periods."""
+    tempos = [bucket['avg_tempo'] for bucket in buckets]
+    window = TREND_WINDOW[period]
+    trend = [sum(tempos[max(0, i - window + 1):i + 1]) / len(tempos[max(0, i - window + 1):i + 1])
+             for i in range(len(tempos))]
+    frame = Frame(buckets[0]['start'], buckets[-1]['start'], min(tempos), max(tempos), period)
+    half = PERIOD_DAYS[period] / 2
+
+    def line(values, attributes):
+        points = ' '.join('%.1f,%.1f' % (frame.x(bucket['start'] + datetime.timedelta(days=half)), frame.y(value))
+                          for bucket, value in zip(buckets, values))
+        return '<polyline points="%s" fill="none" %s/>' % (points, attributes)
+
+    return svg('Average tempo by %s, lower is faster' % period, frame.grid('min/km') + line(
+        tempos, 'stroke="%s" stroke-opacity="0.4"' % COLOR) + line(trend, 'stroke="%s" stroke-width="2"' % COLOR))
+
+
+def render_charts(buckets, period):
+    if not buckets:
+        return {}
+    return {'distance': mark_safe(distance_chart(buckets, period)), 'pace': mark_safe(pace_chart(buckets, period))}
+
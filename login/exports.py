@@ -0,0 +1,51 @@
+"""Exporting activities as CSV or JSON lines without building the whole file in memory."""
+import csv
+import json
+
+from django.conf import settings
+
+from .models import Activity
+
+FIELDS = ('date', 'duration', 'distance', 'comment', 'calories', 'tempo')
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+class Echo:
+
+    """File-like object which returns written value instead of storing it, used for streaming CSV."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(profile):
+
+    """Yields every activity of the profile as a dict, newest first, reading them from the database in chunks."""
+    activities = Activity.objects.filter(profile=profile).order_by('-date', 'id').values_list(*FIELDS)
+    for row in activities.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        row = dict(zip(FIELDS, row))
+        row['date'] = row['date'].isoformat()
+        yield row
+
+
+def csv_lines(rows):
+
+    """Yields lines of a CSV file with a header line."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in FIELDS])
+
+
+def ndjson_lines(rows):
+
+    """Yields rows as JSON lines."""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def export_lines(profile, file_format):
+
+    """Yields lines of an export of the profile in given format ('csv' or 'ndjson')."""
+    rows = export_rows(profile)
+    return csv_lines(rows) if file_format == 'csv' else ndjson_lines(rows)
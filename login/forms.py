@@ -1,6 +1,7 @@
 import datetime
+import json
+
 from django import forms
-from bootstrap_datepicker_plus import DatePickerInput
 
 
 class NameForm(forms.Form):
@@ -17,7 +18,25 @@ class ActivityForm(forms.Form):
 
     """Form used for creating new activity."""
     date = forms.DateField(label='Date of activity', required=True, initial=datetime.datetime.now(),
-                           widget=DatePickerInput(format='%d/%m/%Y'))
+                           widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
     duration = forms.IntegerField(label='Duration of activity', min_value=1, required=True)
     distance = forms.FloatField(label='Distance of activity', min_value=1, required=True)
     comment = forms.CharField(label='Comment', max_length=120, widget=forms.Textarea, required=False)
+
+
+class ImportForm(forms.Form):
+
+    """Form used for uploading a file with activities."""
+    file = forms.FileField(label='CSV or JSON file with date, duration, distance and comment of activities',
+                           required=True)
+
+
+def form_value(value):
+
+    """Returns a value decoded from JSON as form data, which fields expect to be text.
+
+    Anything but text and null is given as its JSON, e.g. 20200101 as '20200101', so fields reject it as invalid.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
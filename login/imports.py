@@ -0,0 +1,126 @@
+"""Importing activities from CSV and JSON files."""
+import csv
+import io
+import json
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .cache import bump_version
+from .forms import ActivityForm, form_value
+from .metrics import add_metrics
+from .models import Activity, ProfileStats
+from .recompute import check_weight
+
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportResult:
+
+    """Result of an import: number of imported and rejected rows, and messages about the first rejected ones."""
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, number, errors):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            problems = '; '.join('%s: %s' % (field, ' '.join(messages)) for field, messages in errors.items())
+            self.errors.append('Row %d: %s' % (number, problems))
+
+
+def guess_format(name):
+
+    """Returns format of a file based on its name."""
+    return 'csv' if name.lower().endswith('.csv') else 'json'
+
+
+def read_csv(stream):
+
+    """Yields rows of a CSV file with a header line."""
+    yield from csv.DictReader(stream)
+
+
+def read_json(stream, chunk_size=64 * 1024):
+
+    """Yields objects of a JSON array or of JSON lines, reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size).lstrip()
+    in_array = buffer.startswith('[')
+    separators = re.compile(r'[\s,]*' if in_array else r'\s*')
+    position = 1 if in_array else 0
+    eof = False
+    while True:
+        position = separators.match(buffer, position).end()
+        if in_array and buffer.startswith(']', position):
+            return
+        if position == len(buffer) and eof:
+            return
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if eof:
+                raise
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield row
+
+
+def read_rows(file, file_format):
+
+    """Yields rows of an uploaded or opened binary file in given format ('csv' or 'json')."""
+    stream = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    return read_csv(stream) if file_format == 'csv' else read_json(stream)
+
+
+def clean_row(row):
+
+    """Cleans a row with fields of ActivityForm. Returns cleaned data and errors.
+
+    Fields are used directly, because building a whole form for every row takes most of the import time.
+    """
+    cleaned_data = {}
+    errors = {}
+    for name, field in ActivityForm.base_fields.items():
+        try:
+            cleaned_data[name] = field.clean(form_value(row.get(name, '')))
+        except ValidationError as error:
+            errors[name] = error.messages
+    return cleaned_data, errors
+
+
+def import_activities(profile, rows, batch_size=None):
+
+    """Validates rows like ActivityForm does and saves valid ones as activities of the profile in batches.
+
+    Everything is saved in one transaction, so an import is never left half done.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    result = ImportResult()
+    batch = []
+    with transaction.atomic():
+        for number, row in enumerate(rows, 1):
+            if not isinstance(row, dict):
+                row = {}
+            cleaned_data, errors = clean_row(row)
+            if errors:
+                result.reject(number, errors)
+                continue
+            batch.append(Activity(profile=profile, **cleaned_data))
+            if len(batch) >= batch_size:
+                Activity.objects.bulk_create(add_metrics(batch, profile.weight))
+                result.imported += len(batch)
+                batch = []
+        Activity.objects.bulk_create(add_metrics(batch, profile.weight))
+        result.imported += len(batch)
+        ProfileStats.rebuild(profile)
+        bump_version(profile.id)
+        transaction.on_commit(lambda: check_weight(profile.id, profile.weight))
+    return result
@@ -0,0 +1,113 @@
+"""Queue of jobs stored in the database and run by the worker command or by background threads of the web process.
+
+Functions decorated with @task can be queued with func.delay(*args). Arguments have to be JSON serializable.
+A job is queued in the current transaction, so it exists only if the work that needs it was committed.
+"""
+import datetime
+import json
+import logging
+import os
+import socket
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .background import submit
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(max_attempts=3, timeout=600):
+
+    """Registers a function as a task under its name.
+
+    A failed job is tried again max_attempts times in total, waiting longer after every attempt. A job running
+    longer than timeout seconds is considered lost and given to another worker.
+    """
+    def register(func):
+        func.max_attempts = max_attempts
+        func.timeout = timeout
+        func.delay = lambda *args: enqueue(func.__name__, *args)
+        TASKS[func.__name__] = func
+        return func
+    return register
+
+
+def enqueue(name, *args):
+
+    """Queues a job of a registered task. Background threads start on it after commit, if there are any."""
+    if name not in TASKS:
+        raise KeyError("Unknown task: %s" % name)
+    job = Job.objects.create(task=name, args=json.dumps(args))
+    if settings.BACKGROUND_THREADS:
+        transaction.on_commit(lambda: submit(work, 'web-%d' % os.getpid()))
+    return job
+
+
+def worker_name():
+    return '%s-%d' % (socket.gethostname(), os.getpid())
+
+
+def claim(worker):
+
+    """Takes the next due job for a worker, or returns None when there is none.
+
+    Jobs are taken with an update conditioned on their current status and run_at, so of two workers
+    reaching for the same job only one gets it.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status__in=[Job.QUEUED, Job.RUNNING], run_at__lte=now).order_by('run_at')
+    for job in due[:settings.JOB_CLAIM_BATCH]:
+        func = TASKS.get(job.task)
+        timeout = func.timeout if func else 0
+        if Job.objects.filter(pk=job.pk, status=job.status, run_at=job.run_at).update(
+                status=Job.RUNNING, run_at=now + datetime.timedelta(seconds=timeout), worker=worker,
+                attempts=F('attempts') + 1):
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run(job):
+
+    """Runs a claimed job. It is deleted when it succeeds, queued again or marked failed when it doesn't."""
+    func = TASKS.get(job.task)
+    try:
+        if func is None:
+            raise KeyError("Unknown task: %s" % job.task)
+        if job.attempts > func.max_attempts:
+            raise RuntimeError("Job was lost by its workers %d times." % func.max_attempts)
+        func(*json.loads(job.args))
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Job %d (%s) failed.", job.id, job.task)
+        if func is not None and job.attempts < func.max_attempts:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            changes = {'status': Job.QUEUED, 'run_at': timezone.now() + datetime.timedelta(seconds=delay)}
+        else:
+            changes = {'status': Job.FAILED}
+        # Conditions keep a worker from touching a job which it lost and another worker took.
+        Job.objects.filter(pk=job.pk, worker=job.worker, attempts=job.attempts).update(error=error, **changes)
+        return False
+    Job.objects.filter(pk=job.pk, worker=job.worker, attempts=job.attempts).delete()
+    return True
+
+
+def work(worker=None, limit=None):
+
+    """Runs due jobs until there are none left (or limit of them ran). Returns number of jobs run."""
+    worker = worker or worker_name()
+    done = 0
+    while limit is None or done < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run(job)
+        done += 1
+    return done
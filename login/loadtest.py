@@ -0,0 +1,206 @@
+"""Load testing a running server over HTTP, with one logged in session per concurrent worker."""
+import http.cookiejar
+import random
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class Session:
+
+    """HTTP session with cookies, logged in through the login page like a browser would."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, data=None):
+        """Returns status and body of a GET (or POST when data is given) request.
+
+        Redirects are followed, path of the page where they ended is kept in self.path.
+        """
+        url = self.base_url + path
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(url, data=body, headers={'Referer': url})
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                self.path = urllib.parse.urlsplit(response.geturl()).path
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            self.path = urllib.parse.urlsplit(error.geturl()).path
+            return error.code, error.read()
+
+    def post_form(self, path, data):
+        """Posts a form on the page at path, with the CSRF token from that page."""
+        status, body = self.request(path)
+        token = CSRF_INPUT.search(body.decode())
+        return self.request(path, dict(data, csrfmiddlewaretoken=token.group(1) if token else ''))
+
+    def login(self, username, password):
+        status, body = self.post_form('/accounts/login/', {'username': username, 'password': password})
+        if b'name="password"' in body:
+            raise ValueError("Could not log in as %s." % username)
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0
+
+
+def summarize(timings, errors, elapsed):
+
+    """Returns throughput, error rate and latency percentiles (in milliseconds) of a run."""
+    total = len(timings) + errors
+    return {'requests': total, 'errors': errors, 'error_rate': errors / total if total else 0,
+            'seconds': elapsed, 'throughput': total / elapsed if elapsed else 0,
+            'mean_ms': statistics.mean(timings) * 1000 if timings else 0,
+            'p50_ms': percentile(timings, 0.5) * 1000, 'p95_ms': percentile(timings, 0.95) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000}
+
+
+class Results:
+
+    """Latencies of successful requests and numbers of failed ones, in total and per step, safe to share by threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.errors = {}
+
+    def add(self, step, elapsed, ok):
+        with self.lock:
+            self.timings.setdefault(step, [])
+            self.errors.setdefault(step, 0)
+            if ok:
+                self.timings[step].append(elapsed)
+            else:
+                self.errors[step] += 1
+
+    def report(self, elapsed):
+        """Returns summary of all requests with summaries of every step under 'steps'."""
+        timings = [timing for step_timings in self.timings.values() for timing in step_timings]
+        report = summarize(timings, sum(self.errors.values()), elapsed)
+        report['steps'] = {step: summarize(self.timings[step], self.errors[step], elapsed) for step in self.timings}
+        return report
+
+
+def run(base_url, paths, requests, concurrency, username, password):
+
+    """Gets paths in turn with concurrent logged in workers until given number of requests is made."""
+    sessions = []
+    for i in range(concurrency):
+        session = Session(base_url)
+        session.login(username, password)
+        sessions.append(session)
+    lock = threading.Lock()
+    results = Results()
+    issued = [0]
+
+    def work(session):
+        while True:
+            with lock:
+                if issued[0] >= requests:
+                    return
+                path = paths[issued[0] % len(paths)]
+                issued[0] += 1
+            start = time.perf_counter()
+            try:
+                status, body = session.request(path)
+            except OSError:
+                status = None
+            results.add(path, time.perf_counter() - start, status == 200)
+
+    return run_threads(work, sessions, results)
+
+
+def run_threads(work, arguments, results):
+    threads = [threading.Thread(target=work, args=(argument,)) for argument in arguments]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results.report(time.perf_counter() - start)
+
+
+def journey(session, rng, username, activities, think_time, results):
+
+    """Goes through the life of a new user: signs up, creates a profile, adds activities and looks at them.
+
+    Every step is timed with loading of its form and following of redirects, and fails when it doesn't end on the
+    expected page. Between steps the user thinks for think_time seconds on average. Returns whether all steps passed.
+    """
+    password = 'Load-test-%d' % rng.randrange(10 ** 9)
+    steps = [('signup', '/signup/', {'username': username, 'password1': password, 'password2': password}, '/form/'),
+             ('profile', '/form/', {'weight': rng.randint(45, 100), 'height': rng.randint(150, 200),
+                                    'age': rng.randint(16, 75), 'gender': rng.choice(['Female', 'Male'])}, '/')]
+    for i in range(activities):
+        distance = round(rng.uniform(3, 15), 1)
+        steps.append(('add_activity', '/new_activity/', {
+            'date': '2020-%02d-%02d' % (rng.randint(1, 12), rng.randint(1, 28)), 'distance': distance,
+            'duration': round(distance * rng.uniform(4.5, 7.5)), 'comment': 'Load test'}, '/view_history/'))
+    steps += [('history', '/view_history/', None, '/view_history/'), ('stats', '/stats/', None, '/stats/')]
+    for step, path, data, expected in steps:
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+        start = time.perf_counter()
+        try:
+            status, body = session.post_form(path, data) if data is not None else session.request(path)
+            ok = status == 200 and session.path == expected
+        except OSError:
+            ok = False
+        results.add(step, time.perf_counter() - start, ok)
+        if not ok:
+            return False
+    return True
+
+
+def run_journeys(base_url, journeys, concurrency, activities=5, think_time=0, seed=0, prefix=None):
+
+    """Runs journeys of new users named prefix0, prefix1, ... with concurrent workers and reports every step.
+
+    The same seed gives the same journeys, so reports of different commits can be compared. Journeys which failed a
+    step are counted in 'failed_journeys'.
+    """
+    prefix = prefix or 'load%x-' % int(time.time() * 1000)
+    lock = threading.Lock()
+    results = Results()
+    counters = {'started': 0, 'failed': 0}
+
+    def work(worker):
+        while True:
+            with lock:
+                if counters['started'] >= journeys:
+                    return
+                number = counters['started']
+                counters['started'] += 1
+            rng = random.Random('%s-%d' % (seed, number))
+            if not journey(Session(base_url), rng, prefix + str(number), activities, think_time, results):
+                with lock:
+                    counters['failed'] += 1
+
+    report = run_threads(work, range(concurrency), results)
+    report.update(journeys=journeys, failed_journeys=counters['failed'])
+    return report
+
+
+def compare(report, baseline):
+
+    """Returns lines with changes of throughput, errors and latencies of every step against a baseline report."""
+    lines = []
+    for step in sorted(report['steps']):
+        if step not in baseline.get('steps', {}):
+            continue
+        new, old = report['steps'][step], baseline['steps'][step]
+        lines.append('%s: %s' % (step, ', '.join(
+            '%s %g -> %g%s' % (key, round(old[key], 1), round(new[key], 1),
+                               ' (%+.0f%%)' % ((new[key] / old[key] - 1) * 100) if old[key] else '')
+            for key in ['throughput', 'errors', 'p50_ms', 'p95_ms', 'p99_ms'])))
+    return lines
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+
+from login.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+
+    """Command used for running benchmarks on a temporary test database."""
+    help = "Runs given benchmarks (or all of them) on a temporary test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Names of benchmarks: %s." % ', '.join(BENCHMARKS))
+        parser.add_argument('--repeat', type=int, default=5, help="How many times every measurement is repeated.")
+        parser.add_argument('--json', help="Path of a file to write results of benchmarks which return them.")
+        parser.add_argument('--limits', help="Path of a JSON file with limits replacing the default ones for this "
+                                             "machine, by benchmark, e.g. {\"views\": {\"ms\": {\"history\": 80}}}.")
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError("Unknown benchmarks: %s." % ', '.join(unknown))
+        limits = {}
+        if options['limits']:
+            with open(options['limits']) as file:
+                limits = json.load(file)
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        results = {}
+        try:
+            for name in names:
+                self.stdout.write(name)
+                kwargs = {'limits': limits[name]} if name in limits else {}
+                result = BENCHMARKS[name](self.stdout, repeat=options['repeat'], **kwargs)
+                if result is not None:
+                    results[name] = result
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        if options['json']:
+            with open(options['json'], 'w') as file:
+                json.dump(results, file, indent=2)
+        failures = [failure for result in results.values() for failure in result.get('failures', [])]
+        if failures:
+            raise CommandError("%d limits exceeded." % len(failures))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from login.assets import outdated, write_bundles
+
+
+class Command(BaseCommand):
+
+    """Command used for joining vendored and own static files into bundles loaded by every page."""
+    help = "Writes bundles of static files listed in login.assets.BUNDLES into login/static."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only fail when a bundle is out of date.")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            names = outdated()
+            if names:
+                raise CommandError("Out of date: %s. Run manage.py bundle_assets." % ', '.join(names))
+            return
+        names = write_bundles()
+        self.stdout.write("Wrote %s." % ', '.join(names) if names else "Bundles are up to date.")
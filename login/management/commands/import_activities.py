@@ -0,0 +1,33 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from login.imports import guess_format, import_activities, read_rows
+from login.models import Profile
+
+
+class Command(BaseCommand):
+
+    """Command used for importing activities of a user from a CSV or JSON file."""
+    help = "Imports activities from a CSV file, a JSON array or JSON lines into the profile of a user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'], help="Format of the file, guessed from its name.")
+        parser.add_argument('--batch-size', type=int, help="How many activities are inserted at once.")
+
+    def handle(self, *args, **options):
+        try:
+            profile = Profile.objects.get(user__username=options['username'])
+        except Profile.DoesNotExist:
+            raise CommandError("User %s has no profile." % options['username'])
+        with open(options['path'], 'rb') as file:
+            rows = read_rows(file, options['format'] or guess_format(options['path']))
+            try:
+                result = import_activities(profile, rows, options['batch_size'])
+            except (ValueError, csv.Error) as error:
+                raise CommandError("File is not a valid CSV or JSON file: %s" % error)
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write("Imported %d activities, rejected %d rows." % (result.imported, result.rejected))
@@ -0,0 +1,65 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from login.loadtest import compare, run, run_journeys
+
+
+class Command(BaseCommand):
+
+    """Command used for measuring throughput of a running server, e.g. WSGI workers against an ASGI server.
+
+    For example, with a user foo having a profile, compare:
+        gunicorn runtivate.wsgi --workers 4 --bind 127.0.0.1:8000
+        gunicorn runtivate.asgi --workers 4 --bind 127.0.0.1:8001 --worker-class uvicorn.workers.UvicornWorker
+    by running the command once with --url http://127.0.0.1:8000 and once with --url http://127.0.0.1:8001.
+
+    With --journeys new users sign up, create profiles, add activities and look at their history and statistics.
+    Reports written with --output by one commit can be given as --baseline to the next one, which prints changes.
+    """
+    help = "Sends concurrent requests of a logged in user to a running server and reports throughput and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Base url of the server.")
+        parser.add_argument('--username')
+        parser.add_argument('--password')
+        parser.add_argument('--paths', nargs='+', default=['/view_history/', '/stats/'],
+                            help="Paths requested in turn.")
+        parser.add_argument('--requests', type=int, default=1000, help="Number of requests.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Number of concurrent workers.")
+        parser.add_argument('--journeys', type=int, help="Number of journeys of new users instead of requests.")
+        parser.add_argument('--activities', type=int, default=5, help="Activities added in every journey.")
+        parser.add_argument('--think-time', type=float, default=0,
+                            help="Mean number of seconds a user waits between steps of a journey.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the random data of journeys.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+        parser.add_argument('--output', help="Write the report as JSON to this file.")
+        parser.add_argument('--baseline', help="Compare with a report written by --output.")
+
+    def handle(self, *args, **options):
+        if options['journeys']:
+            report = run_journeys(options['url'], options['journeys'], options['concurrency'],
+                                  options['activities'], options['think_time'], options['seed'])
+        elif options['username'] and options['password']:
+            report = run(options['url'], options['paths'], options['requests'], options['concurrency'],
+                         options['username'], options['password'])
+        else:
+            raise CommandError("Give --username and --password of a user with a profile, or --journeys.")
+        report['options'] = {key: options[key] for key in ['url', 'paths', 'requests', 'concurrency', 'journeys',
+                                                           'activities', 'think_time', 'seed']}
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write("%(requests)d requests, %(errors)d errors in %(seconds).2f s: %(throughput).1f "
+                              "requests/s" % report)
+            self.stdout.write("latency ms: mean %(mean_ms).1f, p50 %(p50_ms).1f, p95 %(p95_ms).1f, p99 %(p99_ms).1f"
+                              % report)
+            if 'failed_journeys' in report:
+                self.stdout.write("%(failed_journeys)d of %(journeys)d journeys failed" % report)
+            if options['baseline']:
+                with open(options['baseline']) as file:
+                    for line in compare(report, json.load(file)):
+                        self.stdout.write(line)
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+
+from login.benchmarks import create_runner
+from login.cache import get_cache
+from login.profiler import profile_rendering
+
+
+class Command(BaseCommand):
+
+    """Command used for finding where rendering of pages spends time, on a temporary test database."""
+    help = "Renders pages of a user with many activities and reports time spent in every template and tag."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/view_history/', '/stats/?period=week'],
+                            help="Paths of rendered pages.")
+        parser.add_argument('--activities', type=int, default=10000, help="Number of activities of the user.")
+        parser.add_argument('--page-size', type=int, help="Activities on a page of history.")
+        parser.add_argument('--repeat', type=int, default=5, help="How many times every page is rendered.")
+        parser.add_argument('--limit', type=int, default=15, help="How many templates and tags are shown.")
+
+    def handle(self, *args, **options):
+        with override_settings(HISTORY_PAGE_SIZE=options['page_size'] or settings.HISTORY_PAGE_SIZE):
+            self.profile(options)
+
+    def profile(self, options):
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            client, profile = create_runner('profiler', options['activities'])
+            for path in options['paths']:
+                client.get(path)
+                with profile_rendering() as render_profile:
+                    for i in range(options['repeat']):
+                        get_cache().clear()
+                        client.get(path)
+                self.stdout.write("%s, mean of %d renders:" % (path, options['repeat']))
+                self.stdout.write("%10s %10s %7s  %s" % ('own ms', 'total ms', 'calls', 'template and tag'))
+                for row in render_profile.rows(options['limit']):
+                    self.stdout.write("%10.2f %10.2f %7d  %s %s" % (
+                        row['own_ms'] / options['repeat'], row['total_ms'] / options['repeat'],
+                        row['calls'] // options['repeat'], row['template'], row['node']))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
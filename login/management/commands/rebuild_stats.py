@@ -0,0 +1,47 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from login.models import Profile, Activity, ProfileStats
+from login.recompute import rebuild_stats
+
+
+class Command(BaseCommand):
+
+    """Command used for counting stored statistics of profiles from scratch or checking that they are correct."""
+    help = "Rebuilds statistics of every profile, or with --verify only checks them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Only compare stored statistics with freshly counted ones.")
+        parser.add_argument('--queue', action='store_true',
+                            help="Queue a job for every profile instead of rebuilding statistics right away.")
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.all()
+        if options['queue']:
+            for profile_id in profiles.values_list('id', flat=True).iterator():
+                rebuild_stats.delay(profile_id)
+            self.stdout.write("Queued rebuilding statistics of %d profiles." % profiles.count())
+            return
+        if not options['verify']:
+            for profile in profiles.iterator():
+                ProfileStats.rebuild(profile)
+            self.stdout.write("Rebuilt statistics of %d profiles." % profiles.count())
+            return
+        wrong = 0
+        for profile in profiles.iterator():
+            stored = ProfileStats.for_profile(profile)
+            activities = Activity.objects.filter(profile=profile, date__lte=timezone.localdate())
+            expected = activities.stats()
+            last_date = activities.aggregate(last=Max('date'))['last']
+            if (stored.count != expected['count'] or stored.duration != expected['time']
+                    or stored.calories != expected['calories'] or stored.last_date != last_date
+                    or not math.isclose(stored.distance, expected['distance'], abs_tol=1e-6)):
+                wrong += 1
+                self.stderr.write("Statistics of profile %d are wrong." % profile.id)
+        if wrong:
+            raise CommandError("%d profiles have wrong statistics." % wrong)
+        self.stdout.write("Statistics of all profiles are correct.")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from login.models import Profile
+from login.recompute import recompute_profile
+
+
+class Command(BaseCommand):
+
+    """Command used for recomputing calories stored on activities of every profile."""
+    help = "Recomputes calories of activities of every profile for its current weight and counts statistics again."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="How many activities are updated in one transaction.")
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.values_list('id', flat=True)
+        updated = 0
+        for profile_id in profiles.iterator():
+            updated += recompute_profile(profile_id, options['batch_size'])
+        self.stdout.write("Updated calories of %d activities of %d profiles." % (updated, profiles.count()))
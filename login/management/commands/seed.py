@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from login.models import User
+from login.seeding import seed
+
+
+class Command(BaseCommand):
+
+    """Command used for filling the database with generated users and activities."""
+    help = "Creates users with profiles and realistic activities, the same for the same seed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help="How many users are created.")
+        parser.add_argument('--activities', type=int, default=1000, help="Mean number of activities of a user.")
+        parser.add_argument('--scale', type=float, default=1,
+                            help="Multiplies the number of users, 100 with the defaults gives about 10M activities.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator.")
+        parser.add_argument('--prefix', default='runner', help="Prefix of usernames.")
+        parser.add_argument('--password', default='runner', help="Password of every user.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="How many rows are inserted in one batch.")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError("Users named %s... already exist, choose another --prefix." % options['prefix'])
+        start = time.perf_counter()
+        users, activities = seed(round(options['users'] * options['scale']), options['activities'], options['seed'],
+                                 options['prefix'], options['password'], options['batch_size'])
+        self.stdout.write("Created %d users with %d activities in %.1f s." % (
+            users, activities, time.perf_counter() - start))
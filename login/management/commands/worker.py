@@ -0,0 +1,47 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from login.jobs import work, worker_name
+
+
+class Command(BaseCommand):
+
+    """Command used for running queued jobs outside of the web process."""
+    help = "Runs queued jobs in several threads until it is stopped, or with --once only the jobs due now."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="How many jobs are run at the same time.")
+        parser.add_argument('--poll-interval', type=float, default=1,
+                            help="How many seconds a thread waits before looking for jobs again when there are none.")
+        parser.add_argument('--once', action='store_true', help="Run jobs due now and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.stdout.write("Ran %d jobs." % work())
+            return
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        threads = [threading.Thread(target=self.loop, args=('%s-%d' % (worker_name(), number), stop,
+                                                               options['poll_interval']))
+                   for number in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        self.stdout.write("Worker started with %d threads." % len(threads))
+        try:
+            while not stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            stop.set()
+        for thread in threads:
+            thread.join()
+
+    def loop(self, worker, stop, poll_interval):
+        try:
+            while not stop.is_set():
+                if not work(worker, limit=1):
+                    stop.wait(poll_interval)
+        finally:
+            connections.close_all()
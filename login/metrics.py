@@ -0,0 +1,42 @@
+"""Calories and tempo of activities, computed in one place for views, statistics, exports and the API."""
+import math
+
+from django.db.models import F
+from django.db.models.functions import Floor
+
+CALORIES_PER_KG_KM = 1.036
+
+
+def calories(distance, weight):
+
+    """Returns calories burned running distance kilometers by a person weighing weight kilograms.
+
+    Halves are rounded up like SQL's ROUND does, not to even like Python's round(), so calories counted in
+    Python and in the database always agree.
+    """
+    return math.floor(distance * weight * CALORIES_PER_KG_KM + 0.5)
+
+
+def tempo(duration, distance):
+
+    """Returns tempo in minutes per kilometer."""
+    return round(duration / distance, 2)
+
+
+def calories_expression(weight):
+
+    """Returns database expression of calories burned during an activity, the same as calories() to the last digit.
+
+    Halves are rounded up with FLOOR(x + 0.5) written out, as ROUND() of floats rounds halves to even on some
+    databases.
+    """
+    return Floor(F('distance') * weight * CALORIES_PER_KG_KM + 0.5)
+
+
+def add_metrics(activities, weight):
+
+    """Sets calories and tempo of every activity in a list for a profile of given weight and returns the list."""
+    for activity in activities:
+        activity.calories = calories(activity.distance, weight)
+        activity.tempo = tempo(activity.duration, activity.distance)
+    return activities
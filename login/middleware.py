@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .routers import PIN_COOKIE, forget_writes, has_written
+
+
+class ReplicaMiddleware:
+
+    """Middleware pinning a client to the primary database for REPLICA_PIN_SECONDS after its request changed data.
+
+    Views reading from replicas then show the client its own changes even if replicas lag behind.
+    It is not used when there are no DATABASE_REPLICAS.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        forget_writes()
+        response = self.get_response(request)
+        if has_written():
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
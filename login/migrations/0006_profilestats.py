@@ -0,0 +1,27 @@
+# Generated by Django 3.0.1 on 2026-10-17 22:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0005_auto_20200121_1157'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('distance', models.FloatField(default=0)),
+                ('duration', models.IntegerField(default=0)),
+                ('calories', models.IntegerField(default=0)),
+                ('last_date', models.DateField(null=True)),
+                ('counted_until', models.DateField()),
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='login.Profile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.1 on 2026-10-17 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0006_profilestats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['profile', '-date', 'id'], name='activity_profile_date_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.0.1 on 2026-10-17 23:06
+
+from django.db import migrations, models
+
+
+def fill_metrics(apps, schema_editor):
+    # Formulas as they were when this migration was written, later changes of login.metrics don't apply here.
+    Activity = apps.get_model('login', 'Activity')
+    batch = []
+    for activity in Activity.objects.select_related('profile').iterator(chunk_size=1000):
+        activity.calories = round(activity.distance * activity.profile.weight * 1.036)
+        activity.tempo = round(activity.duration / activity.distance, 2)
+        batch.append(activity)
+        if len(batch) == 1000:
+            Activity.objects.bulk_update(batch, ['calories', 'tempo'])
+            batch = []
+    Activity.objects.bulk_update(batch, ['calories', 'tempo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0007_activity_profile_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='calories',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='tempo',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(fill_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Floor
+
+
+def round_halves_up(apps, schema_editor):
+    # Calories stored before were rounded to even in Python, this rewrites the few ending in exactly a half.
+    Activity = apps.get_model('login', 'Activity')
+    Profile = apps.get_model('login', 'Profile')
+    for profile_id, weight in Profile.objects.values_list('id', 'weight').iterator():
+        calories = Floor(F('distance') * weight * 1.036 + 0.5)
+        Activity.objects.filter(profile_id=profile_id).exclude(calories=calories).update(calories=calories)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0009_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(round_halves_up, migrations.RunPython.noop),
+    ]
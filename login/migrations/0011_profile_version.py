@@ -0,0 +1,30 @@
+import time
+import uuid
+
+from django.db import migrations, models
+
+import login.models
+
+
+def set_versions(apps, schema_editor):
+    # Adding the field gives every existing profile the same version, and ETags made from it don't name the profile.
+    Profile = apps.get_model('login', 'Profile')
+    for profile in Profile.objects.only('id').iterator():
+        version = '%d-%s' % (time.time() * 1000, uuid.uuid4().hex)
+        Profile.objects.filter(pk=profile.pk).update(version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0010_round_calories_halves_up'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='version',
+            field=models.CharField(default=login.models.new_version, max_length=50),
+        ),
+        migrations.RunPython(set_versions, migrations.RunPython.noop),
+    ]
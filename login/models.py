@@ -1,15 +1,91 @@
+import time
+import uuid
+
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, router
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+from .metrics import add_metrics, calories_expression
+
+
+def new_version():
+
+    """Returns a new unique version, starting with the time it was made in milliseconds."""
+    return '%d-%s' % (time.time() * 1000, uuid.uuid4().hex)
 
 
 class Profile(models.Model):
 
-    """Model used for representing user's profile with additional data required to counting burned calories."""
+    """Model used for representing user's profile with additional data required to counting burned calories.
+
+    Version changes with every write to profile's data, in the same transaction, so all processes see it.
+    """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     weight = models.IntegerField(default=0)
     height = models.IntegerField(default=0)
     age = models.IntegerField(default=0)
     gender = models.CharField(default='U', max_length=20)
+    version = models.CharField(default=new_version, max_length=50)
+
+
+class SQLiteDateTruncMixin:
+
+    """Truncates dates with SQLite's date modifiers instead of Django's Python function called for every row."""
+    modifiers = ''
+
+    def as_sqlite(self, compiler, connection):
+        sql, params = compiler.compile(self.lhs)
+        return 'date(%s, %s)' % (sql, self.modifiers), params
+
+
+class DateTruncWeek(SQLiteDateTruncMixin, TruncWeek):
+    modifiers = "'weekday 0', '-6 days'"
+
+
+class DateTruncMonth(SQLiteDateTruncMixin, TruncMonth):
+    modifiers = "'start of month'"
+
+
+class DateTruncYear(SQLiteDateTruncMixin, TruncYear):
+    modifiers = "'start of year'"
+
+
+TRUNCATE = {'week': DateTruncWeek, 'month': DateTruncMonth, 'year': DateTruncYear}
+
+
+class ActivityQuerySet(models.QuerySet):
+
+    """QuerySet with helpers for counting statistics of activities."""
+
+    def stats(self):
+        """Returns count, calories, distance, time and average tempo of activities counted in one query."""
+        totals = self.aggregate(count=Count('id'), calories=Sum('calories'),
+                                distance=Sum('distance'), time=Sum('duration'))
+        if not totals['count']:
+            return {'count': 0, 'calories': 0, 'distance': 0, 'time': 0, 'avg_tempo': 0}
+        totals['calories'] = int(totals['calories'])
+        totals['avg_tempo'] = round(totals['time'] / totals['distance'], 2)
+        return totals
+
+    def buckets(self, period):
+        """Returns statistics of activities grouped by week, month or year in one query, oldest first."""
+        buckets = list(self.annotate(start=TRUNCATE[period]('date')).values('start').annotate(
+            count=Count('id'), calories=Sum('calories'), distance=Sum('distance'),
+            time=Sum('duration')).order_by('start'))
+        for bucket in buckets:
+            bucket['calories'] = int(bucket['calories'])
+            bucket['avg_tempo'] = round(bucket['time'] / bucket['distance'], 2)
+        return buckets
+
+    def recompute_calories(self, weight):
+        """Updates stored calories of activities which don't match given weight in one query.
+
+        Returns number of updated activities, so running it again for the same weight changes nothing.
+        """
+        calories = calories_expression(weight)
+        return self.exclude(calories=calories).update(calories=calories)
 
 
 class Activity(models.Model):
@@ -20,8 +96,130 @@ class Activity(models.Model):
     duration = models.IntegerField()
     distance = models.FloatField()
     comment = models.CharField(max_length=120)
+    # Derived from the fields above and weight of the profile, see metrics.add_metrics().
+    calories = models.IntegerField(default=0)
+    tempo = models.FloatField(default=0)
+
+    objects = ActivityQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['profile', '-date', 'id'], name='activity_profile_date_idx')]
+
+    def save(self, *args, **kwargs):
+        add_metrics([self], self.profile.weight)
+        super().save(*args, **kwargs)
 
     # For tests:
 
     def __str__(self):
         return self.comment
+
+
+class ProfileStats(models.Model):
+
+    """Model used for keeping totals of user's past activities, so statistics don't have to be counted every time.
+
+    Totals include every activity dated up to counted_until. Activities from later days are folded in
+    when that day comes, so future activities are still left out of statistics.
+    """
+    profile = models.OneToOneField('Profile', on_delete=models.CASCADE, related_name='stats')
+    count = models.IntegerField(default=0)
+    distance = models.FloatField(default=0)
+    duration = models.IntegerField(default=0)
+    calories = models.IntegerField(default=0)
+    last_date = models.DateField(null=True)
+    counted_until = models.DateField()
+
+    @classmethod
+    def rebuild(cls, profile):
+        """Counts totals of the profile from scratch and saves them."""
+        today = timezone.localdate()
+        # Totals are read from the database they are written to, a lagging replica would leave them wrong.
+        activities = Activity.objects.using(router.db_for_write(cls)).filter(profile=profile, date__lte=today)
+        totals = activities.stats()
+        stats, created = cls.objects.update_or_create(profile=profile, defaults={
+            'count': totals['count'], 'distance': totals['distance'], 'duration': totals['time'],
+            'calories': totals['calories'], 'last_date': activities.aggregate(last=Max('date'))['last'],
+            'counted_until': today})
+        return stats
+
+    @classmethod
+    def for_profile(cls, profile):
+        """Returns up to date totals of the profile, counting them if they were never counted before."""
+        try:
+            stats = cls.objects.get(profile=profile)
+        except cls.DoesNotExist:
+            return cls.rebuild(profile)
+        stats.profile = profile
+        stats.fold(timezone.localdate())
+        return stats
+
+    @classmethod
+    def record(cls, activity, sign=1):
+        """Adds (or with sign=-1 subtracts) an activity to the totals of its profile if it is already counted."""
+        counted = cls.objects.filter(profile_id=activity.profile_id, counted_until__gte=activity.date)
+        changes = {'count': F('count') + sign, 'distance': F('distance') + sign * activity.distance,
+                   'duration': F('duration') + sign * activity.duration,
+                   'calories': F('calories') + sign * activity.calories}
+        if sign > 0:
+            date = Value(activity.date, output_field=models.DateField())
+            changes['last_date'] = Greatest(Coalesce('last_date', date), date)
+        counted.update(**changes)
+        if sign < 0:
+            # The activity itself is left out, as editing subtracts it while its old row is still saved.
+            last = Activity.objects.filter(profile_id=activity.profile_id, date__lte=OuterRef('counted_until')).exclude(
+                pk=activity.pk)
+            counted.filter(last_date=activity.date).update(
+                last_date=Subquery(last.order_by('-date').values('date')[:1]))
+
+    def fold(self, today):
+        """Adds activities dated between the last counted day and today to the totals."""
+        if self.counted_until >= today:
+            return
+        using = router.db_for_write(ProfileStats)
+        new = Activity.objects.using(using).filter(profile_id=self.profile_id, date__gt=self.counted_until,
+                                                   date__lte=today)
+        totals = new.stats()
+        changes = {'counted_until': today}
+        if totals['count']:
+            changes.update(count=F('count') + totals['count'], distance=F('distance') + totals['distance'],
+                           duration=F('duration') + totals['time'], calories=F('calories') + totals['calories'],
+                           last_date=new.aggregate(last=Max('date'))['last'])
+        # Only one request may fold the same days, others just read its result.
+        ProfileStats.objects.filter(pk=self.pk, counted_until=self.counted_until).update(**changes)
+        self.refresh_from_db(using=using)
+
+    def totals(self):
+        """Returns totals in the same form as ActivityQuerySet.stats()."""
+        if not self.count:
+            return {'count': 0, 'calories': 0, 'distance': 0, 'time': 0, 'avg_tempo': 0}
+        return {'count': self.count, 'calories': self.calories, 'distance': round(self.distance, 3),
+                'time': self.duration, 'avg_tempo': round(self.duration / self.distance, 2)}
+
+
+class Job(models.Model):
+
+    """Model used for queueing work done outside of requests by the worker command, see jobs.py.
+
+    A running job has run_at moved by the task's timeout. If its worker dies, the job becomes visible
+    to other workers again when that time passes.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    task = models.CharField(max_length=100)
+    args = models.TextField(default='[]')
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx')]
+
+    def __str__(self):
+        return '%s%s' % (self.task, self.args)
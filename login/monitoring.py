@@ -0,0 +1,142 @@
+"""Measuring time and SQL queries of requests per view, kept in histograms of fixed size in every process."""
+import bisect
+import math
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+
+    """Counts of values in buckets growing by a constant factor, so memory doesn't grow with the number of values.
+
+    Percentiles are given as upper bounds of buckets, at most (growth - 1) above the real value.
+    Histograms of integers have integer bounds starting at 0, so small counts, zero included, are exact.
+    """
+
+    def __init__(self, smallest=0.01, largest=600000, growth=1.1, integers=False):
+        size = math.ceil(math.log(largest / smallest, growth)) + 1
+        self.bounds = [smallest * growth ** i for i in range(size)]
+        if integers:
+            self.bounds = sorted({0} | {math.floor(bound) for bound in self.bounds})
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, percent):
+        """Returns a value which percent of added values don't exceed, or 0 if nothing was added."""
+        if not self.count:
+            return 0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else math.inf
+        return math.inf
+
+    def summary(self):
+        summary = {'mean': round(self.total / self.count, 2) if self.count else 0}
+        for percent in PERCENTILES:
+            summary['p%d' % percent] = round(self.percentile(percent), 2)
+        return summary
+
+
+class ViewStats:
+
+    """Request count and histograms of time, SQL query count and SQL time of one view."""
+
+    def __init__(self):
+        self.time = Histogram()
+        self.queries = Histogram(smallest=1, largest=100000, integers=True)
+        self.sql_time = Histogram()
+
+    def add(self, elapsed, queries, sql_time):
+        self.time.add(elapsed)
+        self.queries.add(queries)
+        self.sql_time.add(sql_time)
+
+    def summary(self):
+        return {'requests': self.time.count, 'time_ms': self.time.summary(), 'queries': self.queries.summary(),
+                'sql_time_ms': self.sql_time.summary()}
+
+
+_views = {}
+_lock = threading.Lock()
+
+
+def record(view_name, elapsed, queries, sql_time):
+    with _lock:
+        if view_name not in _views:
+            _views[view_name] = ViewStats()
+        _views[view_name].add(elapsed, queries, sql_time)
+
+
+def view_stats():
+
+    """Returns summaries of all views measured by this process, by view name."""
+    with _lock:
+        return {name: stats.summary() for name, stats in sorted(_views.items())}
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+class QueryTimer:
+
+    """Database execute wrapper counting queries and their time in milliseconds."""
+
+    def __init__(self):
+        self.queries = 0
+        self.time = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += (time.perf_counter() - start) * 1000
+            self.queries += 1
+
+
+class MonitoringMiddleware:
+
+    """Middleware measuring MONITORING_SAMPLE_RATE of requests: their time and SQL queries, per view.
+
+    Measured responses get a Server-Timing header. It is not used when the sample rate is 0.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MONITORING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.MONITORING_SAMPLE_RATE:
+            return self.get_response(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = (time.perf_counter() - start) * 1000
+        match = getattr(request, 'resolver_match', None)
+        record(match.view_name if match else '<unresolved>', elapsed, timer.queries, timer.time)
+        response['Server-Timing'] = 'app;dur=%.1f, db;dur=%.1f;desc="%d queries"' % (
+            elapsed, timer.time, timer.queries)
+        return response
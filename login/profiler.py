@@ -0,0 +1,81 @@
+"""Profiling of template rendering: time spent in every template and in every tag and variable of it."""
+import time
+from contextlib import contextmanager
+
+from django.template.base import Node, Template, TextNode, VariableNode
+
+
+def template_name(origin):
+    return origin.template_name or origin.name
+
+
+def node_name(node):
+
+    """Returns source of a tag or a variable, e.g. {% url 'detail' activity.id %}, shortened to 60 characters."""
+    token = getattr(node, 'token', None)
+    if token is None:
+        return type(node).__name__
+    source = ('{{ %s }}' if isinstance(node, VariableNode) else '{%% %s %%}') % token.contents
+    return source if len(source) <= 60 else source[:57] + '...'
+
+
+class RenderProfile:
+
+    """Number of calls, total time and own time (without nested templates and tags) of rendered parts.
+
+    Templates are kept under (name, ''), their tags and variables under (name, source). Text between them is not
+    measured, as measuring would take longer than copying it.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.nested = []
+
+    def measure(self, key, func, *args):
+        self.nested.append(0)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - self.nested.pop()
+            if self.nested:
+                self.nested[-1] += elapsed
+            stats = self.stats.setdefault(key, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += own
+
+    def rows(self, limit=None):
+        """Returns measured parts, those taking most of their own time first."""
+        rows = [{'template': key[0], 'node': key[1], 'calls': calls, 'total_ms': total * 1000, 'own_ms': own * 1000}
+                for key, (calls, total, own) in self.stats.items()]
+        return sorted(rows, key=lambda row: -row['own_ms'])[:limit]
+
+
+@contextmanager
+def profile_rendering():
+
+    """Measures every template rendered inside the block and yields the RenderProfile.
+
+    Rendering is measured in every thread but one profile can't tell threads apart, so use it where one thread renders.
+    """
+    profile = RenderProfile()
+    render_template = Template._render
+    render_node = Node.render_annotated
+
+    def render_measured_template(template, context):
+        return profile.measure((template_name(template.origin), ''), render_template, template, context)
+
+    def render_measured_node(node, context):
+        if isinstance(node, TextNode):
+            return render_node(node, context)
+        return profile.measure((template_name(node.origin), node_name(node)), render_node, node, context)
+
+    Template._render = render_measured_template
+    Node.render_annotated = render_measured_node
+    try:
+        yield profile
+    finally:
+        Template._render = render_template
+        Node.render_annotated = render_node
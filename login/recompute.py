@@ -0,0 +1,56 @@
+"""Tasks recomputing calories stored on activities when weight of their profile changes, and statistics."""
+from django.conf import settings
+from django.db import transaction
+
+from .cache import bump_version
+from .jobs import task
+from .models import Activity, Profile, ProfileStats
+
+
+@task()
+def rebuild_stats(profile_id):
+
+    """Counts statistics of a profile from scratch."""
+    with transaction.atomic():
+        ProfileStats.rebuild(Profile.objects.get(pk=profile_id))
+        bump_version(profile_id)
+
+
+@task()
+def recompute_profile(profile_id, batch_size=None):
+
+    """Updates calories of all activities of a profile for its current weight and counts its statistics again.
+
+    Activities are updated in batches of consecutive ids, each in its own short transaction, so new activities
+    can be saved in between. Weight is read again for every batch, so when it changes during the run the later
+    batches already use the new one and the run started by that change fixes the earlier ones. Running it
+    again changes nothing. Returns number of updated activities.
+    """
+    batch_size = batch_size or settings.RECOMPUTE_BATCH_SIZE
+    activities = Activity.objects.filter(profile_id=profile_id).order_by('id')
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(activities.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            weight = Profile.objects.values_list('weight', flat=True).get(pk=profile_id)
+            updated += activities.filter(id__gte=ids[0], id__lte=ids[-1]).recompute_calories(weight)
+        last_id = ids[-1]
+    rebuild_stats(profile_id)
+    return updated
+
+
+def weight_changed(profile):
+
+    """Queues recomputation of calories and statistics of the profile, done once its new weight is committed."""
+    recompute_profile.delay(profile.id)
+
+
+def check_weight(profile_id, weight):
+
+    """Queues recomputation of calories of the profile if its weight is no longer the one activities were
+    saved with, because it changed while they were being saved."""
+    if Profile.objects.filter(pk=profile_id).exclude(weight=weight).exists():
+        recompute_profile.delay(profile_id)
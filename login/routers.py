@@ -0,0 +1,61 @@
+"""Routing reads of some views to read replicas listed in DATABASE_REPLICAS. All writes go to the primary."""
+import random
+from functools import wraps
+
+from asgiref.local import Local
+from django.conf import settings
+
+PIN_COOKIE = 'pin_primary'
+
+_state = Local()
+
+
+def read_from_replica(view):
+
+    """Decorator sending reads of a GET view to a replica, unless the client is pinned to the primary.
+
+    All reads of one request go to the same replica, so they see the same state of the data.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method == 'GET' and PIN_COOKIE not in request.COOKIES and settings.DATABASE_REPLICAS:
+            _state.replica = random.choice(settings.DATABASE_REPLICAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.replica = None
+    return wrapper
+
+
+def forget_writes():
+    _state.wrote = False
+
+
+def mark_written():
+    _state.wrote = True
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+
+    """Router sending reads made by views decorated with read_from_replica to the replica picked for the request."""
+
+    def db_for_read(self, model, **hints):
+        # Sessions and users are read from the primary, as a client reads right after logging in.
+        if model._meta.app_label == 'login':
+            return getattr(_state, 'replica', None)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema by replicating the primary.
+        return db == 'default'
@@ -0,0 +1,92 @@
+"""Generating users with realistic histories of activities for benchmarks and load tests."""
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+
+from .metrics import calories, tempo
+from .models import Activity, Profile, User
+
+COMMENTS = ['', '', '', 'Easy run', 'Recovery run', 'Long run', 'Intervals', 'Tempo run', 'Hill repeats',
+            'Parkrun', 'Run with friends', 'Felt great', 'Tired legs', 'Rainy', 'Hot day', 'Race!']
+ACTIVITY_FIELDS = ['profile_id', 'date', 'distance', 'duration', 'comment', 'calories', 'tempo']
+
+
+def user_rng(seed, number):
+
+    """Returns random generator of one user, so every user gets the same data whatever the batches are."""
+    return random.Random('%s-%d' % (seed, number))
+
+
+def make_profile(user, rng):
+
+    """Returns unsaved profile of user with gender, age, height and weight drawn like in a population of runners."""
+    gender = rng.choice(['Female', 'Male'])
+    return Profile(user=user, gender=gender, age=rng.randint(16, 75), height=round(rng.gauss(
+        166 if gender == 'Female' else 179, 7)), weight=max(40, round(rng.gauss(64 if gender == 'Female' else 79, 10))))
+
+
+def make_activities(profile, rng, mean_count, today):
+
+    """Yields rows of ACTIVITY_FIELDS of a profile going back in time from today.
+
+    Runners differ in how long and how often they run, their usual distance and their pace. Numbers of
+    activities of runners are spread around mean_count, a few runners have many times more.
+    """
+    count = round(mean_count * rng.lognormvariate(-0.28125, 0.75))
+    runs_per_day = count / rng.uniform(180, 3650)
+    usual_distance = rng.uniform(3, 12)
+    pace = rng.uniform(4.5, 7.5)
+    date = today
+    for i in range(count):
+        date -= datetime.timedelta(days=round(rng.expovariate(runs_per_day)))
+        distance = usual_distance * rng.lognormvariate(0, 0.25) * (2 if rng.random() < 0.1 else 1)
+        distance = max(1, round(distance, rng.choice([0, 1, 2])))
+        duration = max(1, round(distance * pace * rng.uniform(0.9, 1.15)))
+        yield (profile.id, date, distance, duration, rng.choice(COMMENTS), calories(distance, profile.weight),
+               tempo(duration, distance))
+
+
+def insert_activities(rows):
+
+    """Inserts rows of ACTIVITY_FIELDS with one executemany, bulk_create spends most of its time creating models."""
+    connection = connections[router.db_for_write(Activity)]
+    ops = connection.ops
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (ops.quote_name(Activity._meta.db_table),
+                                               ', '.join(map(ops.quote_name, ACTIVITY_FIELDS)),
+                                               ', '.join(['%s'] * len(ACTIVITY_FIELDS)))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def seed(users, activities, seed=0, prefix='runner', password='runner', batch_size=5000):
+
+    """Creates users named prefix00000, prefix00001 and so on with profiles and about activities activities each.
+
+    Users and profiles are saved in batches of batch_size with bulk_create, activities in batches of at least
+    batch_size with insert_activities. The same seed gives the same data. Statistics of profiles are counted on
+    their first visit. Returns numbers of created users and activities.
+    """
+    password = make_password(password)
+    today = datetime.date.today()
+    created = 0
+    for start in range(0, users, batch_size):
+        names = {number: '%s%05d' % (prefix, number) for number in range(start, min(start + batch_size, users))}
+        rngs = {number: user_rng(seed, number) for number in names}
+        with transaction.atomic():
+            User.objects.bulk_create([User(username=name, password=password) for name in names.values()])
+            user_ids = dict(User.objects.filter(username__in=names.values()).values_list('username', 'id'))
+            Profile.objects.bulk_create([make_profile(User(id=user_ids[name]), rngs[number])
+                                         for number, name in names.items()])
+            profiles = Profile.objects.in_bulk(user_ids.values(), field_name='user_id')
+            rows = []
+            for number, name in names.items():
+                rows.extend(make_activities(profiles[user_ids[name]], rngs[number], activities, today))
+                if len(rows) >= batch_size:
+                    insert_activities(rows)
+                    created += len(rows)
+                    rows = []
+            insert_activities(rows)
+            created += len(rows)
+    return users, created
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_version
+from .db import apply_pragmas
+from .models import Activity, Profile, new_version
+from .recompute import check_weight
+from .routers import mark_written
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def activity_changed(sender, instance, **kwargs):
+
+    """Changes version of profile's data when one of its activities is saved or deleted."""
+    bump_version(instance.profile_id)
+
+
+@receiver(post_save, sender=Activity)
+def activity_saved(sender, instance, **kwargs):
+
+    """Checks after commit that the profile's weight didn't change while the activity's calories were computed."""
+    profile_id, weight = instance.profile_id, instance.profile.weight
+    transaction.on_commit(lambda: check_weight(profile_id, weight))
+
+
+@receiver(pre_save, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+
+    """Changes version of profile's data when the profile is saved, because calories depend on weight.
+
+    The new version is written by the same query as the profile.
+    """
+    instance.version = new_version()
+    mark_written()
+
+
+@receiver(connection_created)
+def set_sqlite_pragmas(sender, connection, **kwargs):
+
+    """Applies SQLITE_PRAGMAS to every new SQLite connection, e.g. WAL mode so readers don't block writers."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+
+    """Makes persistent connections get checked before the first query of the request and reopened if they
+    stopped working, e.g. after a database restart, instead of failing on it. Connections the request doesn't
+    use aren't checked."""
+    if not settings.DATABASE_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and check_first_query not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, check_first_query)
+
+
+def check_first_query(execute, sql, params, many, context):
+
+    """Execute wrapper checking the connection before the query and removing itself, so it runs once a request.
+
+    A connection found broken is reopened and the query is sent over it with a new cursor.
+    """
+    connection, cursor = context['connection'], context['cursor']
+    connection.execute_wrappers.remove(check_first_query)
+    if not connection.is_usable():
+        connection.close()
+        connection.ensure_connection()
+        cursor.cursor = connection.create_cursor()
+    return execute(sql, params, many, context)
@@ -1,11 +1,26 @@
+import csv
+import datetime
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login, authenticate
-from django.http import Http404
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.contrib.auth.forms import UserCreationForm
 from django.shortcuts import render, redirect, get_object_or_404
 
-from .models import Profile, Activity
-from .forms import NameForm, ActivityForm
+from .models import Profile, Activity, ProfileStats, TRUNCATE
+from .forms import NameForm, ActivityForm, ImportForm
+from .cache import cache_per_profile, page_cache_stats
+from .charts import render_charts
+from .exports import CONTENT_TYPES, export_lines
+from .imports import guess_format, import_activities, read_rows
+from .monitoring import view_stats
+from .routers import read_from_replica
+from . import recompute
 
 
 def home_view(request):
@@ -56,6 +71,7 @@ def form_view(request):
         return render(request, 'home.html')
 
 
+@read_from_replica
 def data_view(request):
 
     """View used for showing information about user's profile."""
@@ -73,11 +89,15 @@ def update_view(request):
         if request.method == 'POST':
             form = NameForm(request.POST)
             if form.is_valid():
+                weight_changed = request.user.profile.weight != form.cleaned_data['weight']
                 request.user.profile.weight = form.cleaned_data['weight']
                 request.user.profile.height = form.cleaned_data['height']
                 request.user.profile.age = form.cleaned_data['age']
                 request.user.profile.gender = form.cleaned_data['gender']
-                request.user.profile.save()
+                with transaction.atomic():
+                    request.user.profile.save()
+                    if weight_changed:
+                        recompute.weight_changed(request.user.profile)
                 return redirect('data/')
         else:
             form = NameForm(initial={"weight": request.user.profile.weight, 'height': request.user.profile.height,
@@ -101,7 +121,9 @@ def add_activity(request):
                 new_activity.distance = form.cleaned_data['distance']
                 new_activity.duration = form.cleaned_data['duration']
                 new_activity.comment = form.cleaned_data['comment']
-                new_activity.save()
+                with transaction.atomic():
+                    new_activity.save()
+                    ProfileStats.record(new_activity)
                 return redirect('view_history')
         else:
             form = ActivityForm()
@@ -110,28 +132,98 @@ def add_activity(request):
         return redirect('home')
 
 
+def import_view(request):
+
+    """View used for importing activities from a CSV or JSON file."""
+    message = "Import your activities!"
+    if request.user.is_authenticated:
+        result = None
+        if request.method == 'POST':
+            form = ImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['file']
+                try:
+                    result = import_activities(request.user.profile, read_rows(upload.file, guess_format(upload.name)))
+                except (ValueError, csv.Error):
+                    form.add_error('file', "File is not a valid CSV or JSON file.")
+        else:
+            form = ImportForm()
+        return render(request, 'import.html', {'form': form, 'message': message, 'result': result})
+    else:
+        return redirect('home')
+
+
+def export_view(request):
+
+    """View used for downloading all activities as CSV (default) or JSON lines (?format=ndjson)."""
+    if request.user.is_authenticated:
+        file_format = request.GET.get('format', 'csv')
+        if file_format not in CONTENT_TYPES:
+            file_format = 'csv'
+        response = StreamingHttpResponse(export_lines(request.user.profile, file_format),
+                                         content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = 'attachment; filename="activities.%s"' % file_format
+        return response
+    else:
+        return redirect('home')
+
+
+@read_from_replica
+@cache_per_profile
 def history_view(request):
 
-    """View used for showing history of user's activities."""
+    """View used for showing history of user's activities.
+
+    History is split into pages. By default the next page is found with a cursor made of date and id of the
+    last shown activity, so deep pages are as fast as the first one. Pages can also be picked by number.
+    """
     if request.user.is_authenticated:
-        history = Activity.objects.all().filter(profile=request.user.profile, date__lte=timezone.now()).order_by(
-            '-date')
-        contex = {'history': history}
+        history = Activity.objects.filter(profile=request.user.profile).order_by('-date', 'id')
+        today = timezone.localdate()
+        page_size = settings.HISTORY_PAGE_SIZE
+        if 'page' in request.GET:
+            page = Paginator(history.filter(date__lte=today), page_size).get_page(request.GET['page'])
+            contex = {'history': list(page), 'page_obj': page}
+        else:
+            cursor = parse_cursor(request.GET.get('after', ''))
+            if cursor and cursor[0] <= today:
+                # A single upper bound on date lets the index seek straight to the cursor.
+                history = history.filter(Q(date__lt=cursor[0]) | Q(id__gt=cursor[1]), date__lte=cursor[0])
+            else:
+                history = history.filter(date__lte=today)
+            activities = list(history[:page_size + 1])
+            contex = {'history': activities[:page_size]}
+            if len(activities) > page_size:
+                last = activities[page_size - 1]
+                contex['next_cursor'] = '%s_%d' % (last.date.isoformat(), last.id)
         return render(request, 'history.html', contex)
     else:
         return redirect('home')
 
 
+def parse_cursor(cursor):
+
+    """Returns date and id from a history cursor, or None when the cursor is not valid."""
+    try:
+        date, activity_id = cursor.split('_')
+        return datetime.date.fromisoformat(date), int(activity_id)
+    except ValueError:
+        return None
+
+
+def get_own_activity(request, activity_id):
+
+    """Returns activity of the logged in user together with their profile in one query, or raises Http404."""
+    return get_object_or_404(Activity.objects.select_related('profile'), pk=activity_id, profile__user=request.user)
+
+
+@read_from_replica
 def activity_detail_view(request, activity_id):
 
     """View used for showing details of one activity."""
     if request.user.is_authenticated:
-        activity = get_object_or_404(Activity, pk=activity_id)
-        if activity.profile.id is not request.user.profile.id:
-            raise Http404("Activity does not exist")
-        calories = round(activity.distance * request.user.profile.weight * 1.036)
-        tempo = round(activity.duration / activity.distance, 2)
-        return render(request, 'details.html', {'activity': activity, 'calories': calories, 'tempo': tempo})
+        activity = get_own_activity(request, activity_id)
+        return render(request, 'details.html', {'activity': activity})
     else:
         return redirect('home')
 
@@ -140,10 +232,10 @@ def remove_view(request, activity_id):
 
     """View used for showing that activity has been deleted."""
     if request.user.is_authenticated:
-        activity = get_object_or_404(Activity, pk=activity_id)
-        if activity.profile.id is not request.user.profile.id:
-            raise Http404("Activity does not exist")
-        activity.delete()
+        activity = get_own_activity(request, activity_id)
+        with transaction.atomic():
+            activity.delete()
+            ProfileStats.record(activity, -1)
         return render(request, 'deleted.html')
     else:
         return redirect('home')
@@ -154,17 +246,18 @@ def edit_activity(request, activity_id):
     """View used for editing an activity."""
     message = "Edit this activity!"
     if request.user.is_authenticated:
-        activity = get_object_or_404(Activity, pk=activity_id)
-        if activity.profile.id is not request.user.profile.id:
-            raise Http404("Activity does not exist")
+        activity = get_own_activity(request, activity_id)
         if request.method == 'POST':
             form = ActivityForm(request.POST)
             if form.is_valid():
-                activity.date = form.cleaned_data['date']
-                activity.distance = form.cleaned_data['distance']
-                activity.duration = form.cleaned_data['duration']
-                activity.comment = form.cleaned_data['comment']
-                activity.save()
+                with transaction.atomic():
+                    ProfileStats.record(activity, -1)
+                    activity.date = form.cleaned_data['date']
+                    activity.distance = form.cleaned_data['distance']
+                    activity.duration = form.cleaned_data['duration']
+                    activity.comment = form.cleaned_data['comment']
+                    activity.save()
+                    ProfileStats.record(activity)
                 return redirect('/view_history')
         else:
             form = ActivityForm(
@@ -175,23 +268,63 @@ def edit_activity(request, activity_id):
         return redirect('home')
 
 
+@read_from_replica
+@cache_per_profile
 def stats_view(request):
 
     """View used for showing statistics of user's activities."""
     if request.user.is_authenticated:
-        activities = Activity.objects.all().filter(profile=request.user.profile, date__lte=timezone.now())
-        if not activities:
+        stats = ProfileStats.for_profile(request.user.profile)
+        if not stats.count:
             return render(request, 'stats.html')
-        count = activities.count()
-        calories = 0
-        distance = 0
-        time = 0
-        for activity in activities:
-            calories += round(activity.distance * request.user.profile.weight * 1.036)
-            distance += activity.distance
-            time += activity.duration
-        avg_tempo = round(time / distance, 2)
-        return render(request, 'stats.html', {'count': count, 'calories': calories, 'distance': distance, 'time': time,
-                                              'avg_tempo': avg_tempo})
+        period = get_period(request)
+        contex = stats.totals()
+        buckets = get_buckets(request, period)
+        contex.update(period=period, periods=list(TRUNCATE), buckets=buckets[::-1],
+                      charts=render_charts(buckets, period))
+        return render(request, 'stats.html', contex)
     else:
         return redirect('home')
+
+
+@read_from_replica
+@cache_per_profile
+def stats_json_view(request):
+
+    """View used for getting weekly, monthly or yearly statistics of user's activities as JSON."""
+    if request.user.is_authenticated:
+        period = get_period(request)
+        buckets = get_buckets(request, period)
+        for bucket in buckets:
+            bucket['start'] = bucket['start'].isoformat()
+        return JsonResponse({'period': period, 'buckets': buckets})
+    else:
+        return redirect('home')
+
+
+def get_period(request):
+
+    """Returns period of statistics asked for with ?period=, by default month."""
+    period = request.GET.get('period', 'month')
+    return period if period in TRUNCATE else 'month'
+
+
+def get_buckets(request, period):
+
+    """Returns statistics of user's past activities grouped by period, oldest first."""
+    activities = Activity.objects.filter(profile=request.user.profile, date__lte=timezone.localdate())
+    return activities.buckets(period)
+
+
+@staff_member_required
+def cache_stats_view(request):
+
+    """View used for showing how many pages were served from the cache."""
+    return JsonResponse(page_cache_stats())
+
+
+@staff_member_required
+def monitoring_view(request):
+
+    """View used for showing time and SQL queries of requests measured by this process, per view."""
+    return JsonResponse({'sample_rate': settings.MONITORING_SAMPLE_RATE, 'views': view_stats()})
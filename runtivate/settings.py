@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from login.db import database_from_env, replicas_from_env
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -23,7 +25,8 @@ SECRET_KEY = 'nrc81vtb5-f+dvdbq6i#(1ljl-u=nb*&#-itzs(oz8j&)&hb+3'
 # SECRET_KEY = os.environ['SECRET_KEY']
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Set DEBUG=0 in production, which also keeps compiled templates in memory.
+DEBUG = os.environ.get('DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'runtivate.herokuapp.com']
 
@@ -38,29 +41,34 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'crispy_forms',
-    "bootstrap4",
-    'bootstrap_datepicker_plus',
 
 ]
 
 MIDDLEWARE = [
+    'login.monitoring.MonitoringMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'login.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'runtivate.urls'
 
+# Templates are read from disk on every render only in debug mode, so changes show up without restarting.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates'),os.path.join(BASE_DIR, 'login/templates/registration')],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -68,6 +76,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
@@ -77,10 +86,38 @@ WSGI_APPLICATION = 'runtivate.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# Configured from environment variables, see login.db.database_from_env. Without DATABASE_URL db.sqlite3 is used.
 DATABASES = {
+    'default': database_from_env(os.environ, os.path.join(BASE_DIR, 'db.sqlite3')),
+    **replicas_from_env(os.environ),
+}
+
+# Read only views read from replicas given in DATABASE_REPLICA_URLS. After writing, a client reads from
+# the primary for REPLICA_PIN_SECONDS, which should be longer than the replication lag.
+DATABASE_ROUTERS = ['login.routers.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+REPLICA_PIN_SECONDS = 15
+
+# Persistent connections are checked before their first use in every request and reopened if the server dropped them.
+DATABASE_HEALTH_CHECKS = os.environ.get('DATABASE_HEALTH_CHECKS', '1') == '1'
+
+# Applied to every new SQLite connection. WAL lets readers work while one process writes, and busy_timeout
+# (in milliseconds) makes writers wait for each other instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -123,4 +160,22 @@ STATIC_URL = '/static/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
+HISTORY_PAGE_SIZE = 50
+# ProfileBackend loads the profile together with the logged in user. Turning it off loads the profile with one
+# more query when a page needs it.
+SELECT_RELATED_PROFILE = True
+AUTHENTICATION_BACKENDS = ['login.backends.ProfileBackend']
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Threads of the web process running queued jobs after the request that queued them commits. Set it to 0
+# when `manage.py worker` runs the jobs instead.
+BACKGROUND_THREADS = int(os.environ.get('BACKGROUND_THREADS', 2))
+JOB_RETRY_DELAY = 30
+JOB_CLAIM_BATCH = 10
+RECOMPUTE_BATCH_SIZE = 1000
+# Share of requests whose time and SQL queries are measured per view and shown on /monitoring/.
+# 0 turns measuring off completely.
+MONITORING_SAMPLE_RATE = float(os.environ.get('MONITORING_SAMPLE_RATE', 1))
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
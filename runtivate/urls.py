@@ -15,9 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from login.views import home_view, form_view, data_view, update_view, add_activity, history_view, activity_detail_view, remove_view, edit_activity, stats_view
+from login.views import home_view, form_view, data_view, update_view, add_activity, history_view, activity_detail_view, remove_view, edit_activity, stats_view, import_view, \
+    export_view, cache_stats_view, stats_json_view, monitoring_view
 from django.conf.urls import url
 from login import views as core_views
+from login import api
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -33,4 +35,12 @@ urlpatterns = [
     path('remove/<int:activity_id>', remove_view, name='remove'),
     path('edit/<int:activity_id>', edit_activity, name='edit'),
     path('stats/', stats_view, name='stats'),
+    path('stats/json/', stats_json_view, name='stats_json'),
+    path('api/activities/', api.activities_api, name='api_activities'),
+    path('api/activities/<int:activity_id>/', api.activity_api, name='api_activity'),
+    path('api/profile/', api.profile_api, name='api_profile'),
+    path('import/', import_view, name='import'),
+    path('export/', export_view, name='export'),
+    path('cache_stats/', cache_stats_view, name='cache_stats'),
+    path('monitoring/', monitoring_view, name='monitoring'),
 ]
\ No newline at end of file